@@ -8,18 +8,21 @@ IU6 Hardware Memory Lab
 Кафедра ИУ-6, МГТУ им. Н.Э. Баумана
 """
 
-from .hardware_client import (
-    HardwareTesterClient,
-    MCUClient,
-    ServerInfo,
-    NetworkInterface,
-    run_experiment
-)
-
-from .generatereport import (
-    ReportGenerator,
-    generate_report
-)
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .hardware_client import (
+        HardwareTesterClient,
+        MCUClient,
+        ServerInfo,
+        NetworkInterface,
+        run_experiment
+    )
+    from .generatereport import (
+        ReportGenerator,
+        generate_report
+    )
 
 __version__ = "1.0.0"
 __author__ = "IU6"
@@ -34,3 +37,29 @@ __all__ = [
     "generate_report"
 ]
 
+# Имя -> модуль пакета. Модули загружаются при первом обращении, поэтому
+# `python -m iu6hardwarememorylab.pretty_print` и другие утилиты Makefile
+# не импортируют клиент (numpy, websockets, rich) при каждом запуске
+_LAZY_EXPORTS = {
+    "HardwareTesterClient": "hardware_client",
+    "MCUClient": "hardware_client",
+    "ServerInfo": "hardware_client",
+    "NetworkInterface": "hardware_client",
+    "run_experiment": "hardware_client",
+    "ReportGenerator": "generatereport",
+    "generate_report": "generatereport",
+}
+
+
+def __getattr__(name):
+    """Импортирует экспортируемый объект из его модуля при первом обращении."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -9,6 +9,8 @@ IU6 Hardware Memory Lab
 Кафедра ИУ-6, МГТУ им. Н.Э. Баумана
 """
 
+from __future__ import annotations
+
 import asyncio
 import json
 import socket
@@ -16,19 +18,234 @@ import struct
 import fcntl
 import array
 import os
+import functools
+import io
+import threading
 import websockets
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
-import matplotlib.pyplot as plt
 import numpy as np
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
 
+# Ускоренный цикл событий на libuv (необязательная зависимость).
+# Отключается переменной окружения MEMORYLAB_NO_UVLOOP.
+UVLOOP_AVAILABLE = False
+if not os.environ.get("MEMORYLAB_NO_UVLOOP"):
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        UVLOOP_AVAILABLE = True
+    except ImportError:
+        pass
+
+# Быстрый разбор ответов сервера (необязательная зависимость)
+try:
+    import orjson
+
+    def _loads(payload):
+        """Разбирает JSON через orjson; нестандартные значения (NaN, Infinity) — через json."""
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return json.loads(payload)
+except ImportError:
+    _loads = json.loads
+
 # Глобальный экземпляр консоли для красивого вывода
 console = Console()
 
+# Масштаб оси X графиков PMU: ключ -> (делитель, суффикс подписи)
+_X_SCALE_RULES = {
+    "fragmentation": (1024, " (КБ)"),
+    "step": (1024, " (КБ)"),
+}
+
+# PMU метрики, которые строятся для каждой точки по умолчанию
+_DEFAULT_PMU_METRICS = ("cache_misses", "branch_misses")
+
+
+def _has_pmu_points(data_points: List[Dict[str, Any]], metrics=_DEFAULT_PMU_METRICS) -> bool:
+    """Проверяет, есть ли в точках данных PMU метрики."""
+    return bool(data_points) and any(m in data_points[0] for m in metrics)
+
+# matplotlib.pyplot загружается при первом построении графика (см. _ensure_mpl):
+# запуск экспериментов без графиков не тратит время на его импорт
+plt = None
+
+
+def _ensure_mpl():
+    """Импортирует matplotlib.pyplot при первом обращении и возвращает его."""
+    global plt
+    if plt is None:
+        import matplotlib.pyplot as pyplot
+        plt = pyplot
+    return plt
+
+
+# Бэкенды matplotlib без окна вывода (пакетные прогоны, CI, MPLBACKEND=agg)
+_NON_INTERACTIVE_BACKENDS = frozenset(("agg", "cairo", "pdf", "pgf", "ps", "svg", "template"))
+
+
+def _is_headless() -> bool:
+    """
+    Проверяет, что активный бэкенд matplotlib неинтерактивный.
+    
+    Проверяется бэкенд, а не sys.stdout.isatty(): в Jupyter stdout не терминал,
+    но графики показываются inline. Бэкенд может смениться после импорта
+    (например, %matplotlib), поэтому проверка выполняется при каждом показе.
+    """
+    return _ensure_mpl().get_backend().lower() in _NON_INTERACTIVE_BACKENDS
+
+
+def _subplots(*args, **kwargs):
+    """
+    Аналог plt.subplots, который можно вызывать из фонового потока.
+    
+    Вне главного потока фигура создаётся без pyplot, чтобы не запускать GUI-бэкенд.
+    """
+    _ensure_mpl()
+    if threading.current_thread() is threading.main_thread():
+        return plt.subplots(*args, **kwargs)
+    from matplotlib.figure import Figure
+    subplot_kw = {key: kwargs.pop(key) for key in ("sharex", "sharey", "squeeze") if key in kwargs}
+    fig = Figure(**kwargs)
+    return fig, fig.subplots(*args, **subplot_kw)
+
+
+class _RGBABuffer(io.BytesIO):
+    """
+    Приёмник для savefig(format='rgba').
+    
+    Agg пишет буфер рендерера одним вызовом write(); вместо байтов
+    сохраняется копия в виде массива (H, W, 4) для matplotlib.image.imsave.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.image: Optional[np.ndarray] = None
+    
+    def write(self, data) -> int:
+        image = np.array(memoryview(data), dtype=np.uint8, copy=True)
+        if image.ndim == 3:
+            self.image = image
+        return image.nbytes
+
+
+def _write_png(path: str, image: np.ndarray, dpi: float, pil_kwargs: Optional[Dict[str, Any]]):
+    """Кодирует готовый буфер RGBA в PNG и записывает файл (выполняется в фоновом потоке)."""
+    from matplotlib.image import imsave
+    imsave(path, image, format="png", dpi=dpi,
+           pil_kwargs=dict(pil_kwargs) if pil_kwargs else None)
+
+
+# Построение графиков вне цикла событий для run_experiment. Один поток на модуль:
+# pyplot не потокобезопасен, а общий пул не плодит потоки при каждом запуске
+_PLOT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot")
+
+
+def _format_pmu_line(indent: str, key: str, value: Any) -> str:
+    """Форматирует строку PMU метрики для файла результатов."""
+    if isinstance(value, float):
+        return f"{indent}{key}: {value:.4f}\n"
+    if isinstance(value, int) and value > 1000000:
+        return f"{indent}{key}: {value:,}\n"
+    return f"{indent}{key}: {value}\n"
+
+
+def _moving_average(values, window: int) -> np.ndarray:
+    """
+    Скользящее среднее по окну window (аналог np.convolve(..., mode='valid')).
+    
+    Считается через накопленную сумму за O(N) вместо O(N * window).
+    
+    Args:
+        values: Последовательность значений
+        window: Размер окна
+        
+    Returns:
+        Массив длины len(values) - window + 1
+    """
+    csum = np.cumsum(np.asarray(values, dtype=np.float64))
+    csum = np.concatenate(([0.0], csum))
+    return (csum[window:] - csum[:-window]) / window
+
+
+def _clip_spikes(values, factor: float = 4.5, max_iter: int = 10) -> np.ndarray:
+    """
+    Заменяет пики-выбросы (значения больше factor * медиана) на медиану.
+    
+    Args:
+        values: Последовательность значений
+        factor: Во сколько раз значение должно превышать медиану, чтобы считаться выбросом
+        max_iter: Максимальное количество проходов
+        
+    Returns:
+        Массив numpy с заменёнными выбросами
+    """
+    result = np.array(values, dtype=np.float64)
+    # Несколько проходов пока есть выбросы
+    for _ in range(max_iter):
+        median_val = np.median(result)
+        spikes = result > median_val * factor
+        if not spikes.any():
+            break
+        result[spikes] = median_val
+    return result
+
+
+# Порог длины серии кадров, после которого она прореживается перед отрисовкой
+_LTTB_THRESHOLD = 4000
+
+
+def _lttb(xs: np.ndarray, ys: np.ndarray, n_out: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прореживает ряд алгоритмом Largest-Triangle-Three-Buckets.
+    
+    Первая и последняя точки сохраняются, остальные делятся на n_out - 2 корзины.
+    Из каждой корзины берётся точка, образующая наибольший треугольник
+    с предыдущей выбранной точкой и средним следующей корзины.
+    
+    Args:
+        xs: Координаты X (numpy массив)
+        ys: Координаты Y (numpy массив)
+        n_out: Количество точек на выходе
+        
+    Returns:
+        Кортеж (xs, ys) прореженного ряда
+    """
+    n = len(xs)
+    if n_out < 3 or n <= n_out:
+        return xs, ys
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # Средние по корзинам через кумулятивные суммы
+    cum_x = np.concatenate(([0.0], np.cumsum(xs)))
+    cum_y = np.concatenate(([0.0], np.cumsum(ys)))
+    counts = np.diff(edges)
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        else:
+            next_x, next_y = xs[-1], ys[-1]
+        area = np.abs((xs[prev] - next_x) * (ys[lo:hi] - ys[prev])
+                      - (xs[prev] - xs[lo:hi]) * (next_y - ys[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    
+    return xs[selected], ys[selected]
+
 
 @dataclass
 class ServerInfo:
@@ -65,7 +282,8 @@ class HardwareTesterClient:
     SERVER_NAME = "HardwareTester"
     CONNECTION_TIMEOUT = 5
     
-    def __init__(self, host: Optional[str] = None, port: int = DEFAULT_PORT, img_dir: Optional[str] = None, results_file: Optional[str] = None):
+    def __init__(self, host: Optional[str] = None, port: int = DEFAULT_PORT, img_dir: Optional[str] = None, results_file: Optional[str] = None,
+                 fast_save: bool = False, reuse_figure: bool = False):
         """
         Инициализация клиента.
         
@@ -74,6 +292,9 @@ class HardwareTesterClient:
             port: Порт сервера (по умолчанию 8765)
             img_dir: Папка для сохранения графиков (если None, автосохранение отключено)
             results_file: Путь к файлу для сохранения результатов (если None, сохранение отключено)
+            fast_save: Быстрое сохранение графиков (dpi=100, без пересчёта границ) для пакетных прогонов
+            reuse_figure: Переиспользовать одну фигуру для графиков с show=False и заданным img_dir.
+                          Возвращённая фигура перерисовывается следующим вызовом plot_*
         """
         self.host = host
         self.port = port
@@ -82,6 +303,29 @@ class HardwareTesterClient:
         self.websocket = None
         self.server_info: Optional[ServerInfo] = None
         self._connected = False
+        # Отладочный вывод включается переменной окружения MEMORYLAB_DEBUG
+        self._debug = bool(os.environ.get("MEMORYLAB_DEBUG"))
+        # Фоновое сохранение графиков: кодирование PNG не блокирует построение следующего
+        self._save_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="savefig")
+        self._fast_save = fast_save
+        if fast_save:
+            # Разметку уже подгоняет constrained_layout, повторный расчёт bbox не нужен
+            self._savefig_kwargs = {"dpi": 100}
+        else:
+            self._savefig_kwargs = {"dpi": 150, "bbox_inches": "tight"}
+        # Для PNG в быстром режиме ослабляем сжатие zlib: файл чуть больше, кодирование в разы быстрее
+        self._png_savefig_kwargs = (
+            {**self._savefig_kwargs, "pil_kwargs": {"compress_level": 1, "optimize": False}}
+            if fast_save else self._savefig_kwargs
+        )
+        self._pending_saves: List[Tuple[Future, str, str]] = []
+        # Кэш путей сохранения: (имя, явный путь, img_dir) -> итоговый путь.
+        # img_dir входит в ключ: атрибут публичный и может быть изменён после создания
+        self._path_cache: Dict[Tuple[str, Optional[str], Optional[str]], Optional[str]] = {}
+        # Переиспользование одной фигуры при пакетном построении без показа на экране
+        self._reusable_figure = reuse_figure and img_dir is not None
+        self._fig: Optional[plt.Figure] = None
+        self._ax = None
         
         # Создаём папку для изображений если указана
         if self.img_dir:
@@ -107,48 +351,146 @@ class HardwareTesterClient:
         if not self.results_file:
             return
         
+        # Собираем весь блок в памяти и записываем одним вызовом
+        lines = [f"{experiment_name}\n", "-" * 50 + "\n", "Параметры:\n"]
+        lines.extend(f"  {key}: {value}\n" for key, value in params.items())
+        lines.append("\nРезультаты:\n")
+        for key, value in conclusions.items():
+            if isinstance(value, float):
+                lines.append(f"  {key}: {value:.4f}\n")
+            else:
+                lines.append(f"  {key}: {value}\n")
+        
+        # Добавляем PMU метрики если есть
+        if pmu_summary:
+            lines.append("\nPMU метрики:\n")
+            # Проверяем формат: плоский (exp1) или вложенный (exp2+)
+            first_value = next(iter(pmu_summary.values()), None)
+            if isinstance(first_value, dict):
+                # Вложенный формат (несколько категорий)
+                for category, metrics in pmu_summary.items():
+                    lines.append(f"  {category}:\n")
+                    lines.extend(_format_pmu_line("    ", key, value) for key, value in metrics.items())
+            else:
+                # Плоский формат (одна категория)
+                lines.extend(_format_pmu_line("  ", key, value) for key, value in pmu_summary.items())
+        
+        lines.append("\n" + "=" * 70 + "\n\n")
+        
         with open(self.results_file, 'a', encoding='utf-8') as f:
-            f.write(f"{experiment_name}\n")
-            f.write("-" * 50 + "\n")
-            f.write("Параметры:\n")
-            for key, value in params.items():
-                f.write(f"  {key}: {value}\n")
-            f.write("\nРезультаты:\n")
-            for key, value in conclusions.items():
-                if isinstance(value, float):
-                    f.write(f"  {key}: {value:.4f}\n")
-                else:
-                    f.write(f"  {key}: {value}\n")
-            
-            # Добавляем PMU метрики если есть
-            if pmu_summary:
-                f.write("\nPMU метрики:\n")
-                # Проверяем формат: плоский (exp1) или вложенный (exp2+)
-                first_value = next(iter(pmu_summary.values()), None)
-                if isinstance(first_value, dict):
-                    # Вложенный формат (несколько категорий)
-                    for category, metrics in pmu_summary.items():
-                        f.write(f"  {category}:\n")
-                        for key, value in metrics.items():
-                            if isinstance(value, float):
-                                f.write(f"    {key}: {value:.4f}\n")
-                            elif isinstance(value, int) and value > 1000000:
-                                f.write(f"    {key}: {value:,}\n")
-                            else:
-                                f.write(f"    {key}: {value}\n")
-                else:
-                    # Плоский формат (одна категория)
-                    for key, value in pmu_summary.items():
-                        if isinstance(value, float):
-                            f.write(f"  {key}: {value:.4f}\n")
-                        elif isinstance(value, int) and value > 1000000:
-                            f.write(f"  {key}: {value:,}\n")
-                        else:
-                            f.write(f"  {key}: {value}\n")
-            
-            f.write("\n" + "=" * 70 + "\n\n")
+            f.write("".join(lines))
     
 
+    def _save_figure(self, fig: plt.Figure, path: str, label: str = "График"):
+        """
+        Сохраняет фигуру в файл.
+        
+        PNG отрисовывается в буфер RGBA в вызывающем потоке, а в фоновый поток
+        уходит только кодирование и запись файла: фигуру сразу можно менять,
+        показывать и сохранять снова. Остальные форматы сохраняются сразу.
+        Сообщения о сохранении выводятся в вызывающем потоке: при следующих
+        сохранениях, показе фигуры, wait_saves() или close().
+        
+        Args:
+            fig: Фигура matplotlib
+            path: Путь для сохранения
+            label: Подпись для сообщения о сохранении
+        """
+        self._report_saves(block=False)
+        if path.lower().endswith(".png"):
+            buffer = _RGBABuffer()
+            fig.savefig(buffer, format="rgba", **self._savefig_kwargs)
+            if buffer.image is not None:
+                future = self._save_pool.submit(
+                    _write_png, path, buffer.image, self._savefig_kwargs["dpi"],
+                    self._png_savefig_kwargs.get("pil_kwargs")
+                )
+                self._pending_saves.append((future, path, label))
+                return
+        
+        fig.savefig(path, **self._savefig_kwargs)
+        console.print(f"[green][[+]][/green] {label} сохранён: {path}")
+    
+    def _report_saves(self, block: bool):
+        """
+        Выводит результат фоновой записи графиков.
+        
+        Args:
+            block: Дожидаться незавершённых записей (иначе они остаются в очереди)
+        """
+        pending = []
+        for future, path, label in self._pending_saves:
+            if not block and not future.done():
+                pending.append((future, path, label))
+                continue
+            error = future.exception()
+            if error is None:
+                console.print(f"[green][[+]][/green] {label} сохранён: {path}")
+            else:
+                console.print(f"[red][[-]][/red] Ошибка сохранения {path}: {error}")
+        self._pending_saves = pending
+    
+    def wait_saves(self):
+        """Дожидается записи всех графиков и выводит результат сохранения."""
+        self._report_saves(block=True)
+    
+    def close(self):
+        """Дожидается записи графиков и останавливает фоновый поток сохранения."""
+        self.wait_saves()
+        self._save_pool.shutdown(wait=True)
+    
+    def _finish_figure(self, fig):
+        """
+        Возвращает фигуру вызывающему коду.
+        
+        Фигура уже отрисована в буфер, поэтому запись её PNG может
+        продолжаться в фоне; дождаться её можно через wait_saves().
+        """
+        return fig
+    
+    def _show_figure(self, fig):
+        """
+        Показывает фигуру и закрывает её.
+        
+        PNG кодируется в фоне параллельно с показом; результат сохранения
+        выводится после него. С неинтерактивным бэкендом (Agg и т.п.)
+        plt.show() пропускается: показывать некуда.
+        """
+        if not _is_headless():
+            plt.show()
+        self.wait_saves()
+        plt.close(fig)
+    
+    def _get_or_create_axes(self, figsize: Tuple[float, float], show: bool = True):
+        """
+        Возвращает фигуру и оси для графика.
+        
+        Если клиент создан с reuse_figure=True, при пакетном построении
+        (show=False и задан img_dir) одна и та же фигура очищается
+        и используется повторно, вместо создания новой на каждый график.
+        Возвращённая в этом режиме фигура будет перерисована следующим вызовом.
+        
+        Args:
+            figsize: Размер фигуры в дюймах
+            show: Будет ли график показан на экране
+            
+        Returns:
+            Кортеж (Figure, Axes)
+        """
+        if show or not self._reusable_figure:
+            return _subplots(figsize=figsize, facecolor='white', constrained_layout=True)
+        
+        # Фигуру pyplot мог закрыть бэкенд (например, inline в Jupyter)
+        manager = self._fig.canvas.manager if self._fig is not None else None
+        if self._fig is None or (manager is not None and not plt.fignum_exists(manager.num)):
+            self._fig, self._ax = _subplots(figsize=figsize, facecolor='white', constrained_layout=True)
+            return self._fig, self._ax
+        
+        self._ax.clear()
+        self._ax.set_facecolor('white')
+        self._fig.set_size_inches(*figsize)
+        return self._fig, self._ax
+    
     def _get_save_path(self, name: str, save_path: Optional[str] = None) -> Optional[str]:
         """
         Определяет путь для сохранения графика.
@@ -160,6 +502,15 @@ class HardwareTesterClient:
         Returns:
             Путь для сохранения или None
         """
+        key = (name, save_path, self.img_dir)
+        try:
+            return self._path_cache[key]
+        except KeyError:
+            path = self._path_cache[key] = self._build_save_path(name, save_path)
+            return path
+    
+    def _build_save_path(self, name: str, save_path: Optional[str] = None) -> Optional[str]:
+        """Строит путь для сохранения графика (результат кэшируется в _get_save_path)."""
         if save_path:
             return save_path
         if self.img_dir:
@@ -381,7 +732,7 @@ class HardwareTesterClient:
             uri = f"ws://{ip}:{self.port}"
             async with websockets.connect(uri, open_timeout=0.5, close_timeout=0.5) as ws:
                 response = await asyncio.wait_for(ws.recv(), timeout=0.5)
-                data = json.loads(response)
+                data = _loads(response)
                 
                 if data.get("serverName") == self.SERVER_NAME:
                     return True
@@ -416,7 +767,7 @@ class HardwareTesterClient:
             
             # Получаем приветственное сообщение
             response = await self.websocket.recv()
-            data = json.loads(response)
+            data = _loads(response)
             
             self.server_info = ServerInfo(
                 host=self.host,
@@ -497,7 +848,7 @@ class HardwareTesterClient:
             try:
                 # Короткий таймаут позволяет проверять CancelledError
                 response = await asyncio.wait_for(self.websocket.recv(), timeout=0.1)
-                return json.loads(response)
+                return _loads(response)
             except asyncio.TimeoutError:
                 # Таймаут истёк, проверяем не отменена ли задача
                 # Если задача отменена, при следующей итерации возникнет CancelledError
@@ -653,15 +1004,13 @@ class HardwareTesterClient:
         
         # Сглаживание скользящим средним для уменьшения шума
         if smooth and len(times) >= smooth_window:
-            times_arr = np.array(times)
-            kernel = np.ones(smooth_window) / smooth_window
-            times_smoothed = np.convolve(times_arr, kernel, mode='valid')
+            times_smoothed = _moving_average(times, smooth_window)
             # Обрезаем steps_kb чтобы соответствовал сглаженным данным
             offset = (smooth_window - 1) // 2
             steps_kb = steps_kb[offset:offset + len(times_smoothed)]
-            times = times_smoothed.tolist()
+            times = times_smoothed
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         
         ax.plot(steps_kb, times, 'b-', linewidth=1.5, label='Время доступа')
         
@@ -681,29 +1030,26 @@ class HardwareTesterClient:
         ax.text(0.98, 0.98, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='right', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp1_memory_stratification", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="step",
-            x_label="Шаг",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Расслоение памяти",
-            save_path=self._get_save_path("exp1_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="step",
+                x_label="Шаг",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Расслоение памяти",
+                save_path=self._get_save_path("exp1_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
     
     def plot_generic(self, data: Dict[str, Any],
                      x_key: str = "step",
@@ -723,7 +1069,7 @@ class HardwareTesterClient:
         x_values = [p.get(x_key, 0) for p in data_points]
         y_values = [p.get(y_key, 0) for p in data_points]
         
-        fig, ax = plt.subplots(figsize=(10, 6), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(10, 6), show=show)
         ax.plot(x_values, y_values, 'b-', linewidth=1.5, marker='o', markersize=4)
         
         ax.set_xlabel(x_label, fontsize=12)
@@ -731,23 +1077,20 @@ class HardwareTesterClient:
         ax.set_title(title, fontsize=14, fontweight='bold')
         ax.grid(True, linestyle='--', alpha=0.7)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("plot_generic", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
             return None
         
-        return fig
+        return self._finish_figure(fig)
 
     def plot_list_vs_array(self, data: Dict[str, Any],
                            save_path: Optional[str] = None,
-                           show: bool = True) -> plt.Figure:
+                           show: bool = True,
+                           quiet: bool = False) -> plt.Figure:
         """Строит график сравнения ссылочных и векторных структур."""
         if "error" in data:
             console.print(f"[red][[-]][/red] Ошибка в данных: {data['error']}")
@@ -758,9 +1101,11 @@ class HardwareTesterClient:
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
-        # Вывод выводов
-        conclusions = data.get("conclusions", {})
-        if conclusions:
+        params = data.get("parameters", {})
+        conclusions = data.get("conclusions") or {}
+        
+        # Вывод выводов (quiet — без форматирования Rich для пакетных прогонов)
+        if conclusions and not quiet:
             ratio = conclusions.get("list_to_array_ratio", 0)
             
             tbl = Table(show_header=False, box=box.SIMPLE, padding=(0, 1))
@@ -776,19 +1121,19 @@ class HardwareTesterClient:
         self._print_pmu_summary(data, "Эксперимент 2")
         
         # Сохраняем результаты в файл
-        params_exp = data.get("parameters", {})
         self._save_results(
             "Эксперимент 2: Сравнение ссылочных и векторных структур",
-            params_exp,
-            conclusions if conclusions else {},
+            params,
+            conclusions,
             data.get("pmu_summary")
         )
         
-        frags = [p["fragmentation"] / 1024 for p in data_points]
+        frags = np.fromiter((p["fragmentation"] for p in data_points), dtype=np.float64,
+                            count=len(data_points)) / 1024.0
         list_times = [p["list_time_us"] for p in data_points]
         array_times = [p["array_time_us"] for p in data_points]
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(frags, list_times, 'r-', linewidth=1.5, label='Список')
         ax.plot(frags, array_times, 'g-', linewidth=1.5, label='Массив')
         ax.set_xlabel('Фрагментация (КБ)', fontsize=12)
@@ -798,7 +1143,6 @@ class HardwareTesterClient:
         ax.legend(loc='upper right')
         
         # Добавляем вставку с параметрами эксперимента
-        params = data.get("parameters", {})
         info_text = (
             f"Параметры эксперимента:\n"
             f"  • Кол-во элементов: {params.get('param1_m', '?')} М\n"
@@ -809,28 +1153,25 @@ class HardwareTesterClient:
         ax.text(0.98, 0.89, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='right', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp2_list_vs_array", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="fragmentation",
-            x_label="Фрагментация",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Сравнение List vs Array",
-            save_path=self._get_save_path("exp2_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="fragmentation",
+                x_label="Фрагментация",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Сравнение List vs Array",
+                save_path=self._get_save_path("exp2_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
 
     def plot_pmu_metrics(self, data: Dict[str, Any],
                          x_key: str = "step",
@@ -858,7 +1199,7 @@ class HardwareTesterClient:
         
         # Метрики по умолчанию
         if metrics is None:
-            metrics = ["cache_misses", "branch_misses"]
+            metrics = list(_DEFAULT_PMU_METRICS)
         
         # Проверяем наличие данных PMU
         available_metrics = [m for m in metrics if m in data_points[0]]
@@ -869,16 +1210,18 @@ class HardwareTesterClient:
         x_values = [p.get(x_key, i) for i, p in enumerate(data_points)]
         
         # Определяем масштаб X
-        x_scale = 1
-        x_suffix = ""
-        if x_key == "fragmentation" and x_values and x_values[-1] > 1000:
-            x_scale = 1024
-            x_suffix = " (КБ)"
-        elif x_key == "step" and x_values and x_values[-1] > 1000:
-            x_scale = 1024
-            x_suffix = " (КБ)"
+        x_scale, x_suffix = 1, ""
+        if x_values[-1] > 1000:
+            x_scale, x_suffix = _X_SCALE_RULES.get(x_key, (1, ""))
         
-        x_scaled = [x / x_scale for x in x_values]
+        x_scaled = np.asarray(x_values, dtype=np.float64) / x_scale
+        
+        # Столбцы метрик в виде массивов numpy (строятся один раз до цикла по графикам)
+        n_points = len(data_points)
+        columns = {
+            m: np.fromiter((p.get(m, 0) for p in data_points), dtype=np.float64, count=n_points)
+            for m in available_metrics
+        }
         
         # Цвета для разных метрик
         colors = ['#e74c3c', '#3498db', '#2ecc71', '#9b59b6', '#f39c12', '#1abc9c', '#e67e22', '#34495e']
@@ -891,12 +1234,12 @@ class HardwareTesterClient:
             "cycles": "Циклы",
         }
         
-        fig, axes = plt.subplots(len(available_metrics), 1, figsize=(12, 3 * len(available_metrics)), 
-                                  facecolor='white', squeeze=False)
+        fig, axes = _subplots(len(available_metrics), 1, figsize=(12, 3 * len(available_metrics)), 
+                                  facecolor='white', squeeze=False, constrained_layout=True)
         
         for idx, metric in enumerate(available_metrics):
             ax = axes[idx, 0]
-            y_values = [p.get(metric, 0) for p in data_points]
+            y_values = columns[metric]
             
             color = colors[idx % len(colors)]
             label = metric_labels.get(metric, metric)
@@ -912,18 +1255,14 @@ class HardwareTesterClient:
             ax.ticklabel_format(axis='y', style='scientific', scilimits=(6, 6))
         
         fig.suptitle(title, fontsize=14, fontweight='bold')
-        plt.tight_layout()
-        
         if save_path:
-            fig.savefig(save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График PMU сохранён: {save_path}")
+            self._save_figure(fig, save_path, label="График PMU")
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
             return None
         
-        return fig
+        return self._finish_figure(fig)
 
     def plot_prefetch(self, data: Dict[str, Any],
                       save_path: Optional[str] = None,
@@ -951,8 +1290,10 @@ class HardwareTesterClient:
         sample_point = data_points[0]
         is_nanoseconds = "no_prefetch_ns" in sample_point
         
+        params = data.get("parameters", {})
+        conclusions = data.get("conclusions") or {}
+        
         # Вывод выводов
-        conclusions = data.get("conclusions", {})
         if conclusions:
             ratio = conclusions.get("no_prefetch_to_prefetch_ratio", 0)
             
@@ -975,15 +1316,16 @@ class HardwareTesterClient:
         self._print_pmu_summary(data, "Эксперимент 3")
         
         # Сохраняем результаты в файл
-        params_exp = data.get("parameters", {})
         self._save_results(
             "Эксперимент 3: Эффективность программной предвыборки",
-            params_exp,
-            conclusions if conclusions else {},
+            params,
+            conclusions,
             data.get("pmu_summary")
         )
         
-        offsets = [p.get("offset", 0) for p in data_points]  # Показываем в байтах
+        # Показываем в байтах
+        offsets = np.fromiter((p.get("offset", 0) for p in data_points), dtype=np.float64,
+                              count=len(data_points))
         
         if is_nanoseconds:
             no_prefetch = [p.get("no_prefetch_ns", 0) for p in data_points]
@@ -994,39 +1336,21 @@ class HardwareTesterClient:
             prefetch = [p.get("prefetch_us", p.get("prefetch_ns", 0)) for p in data_points]
             y_label = 'Время (мкс)'
         
-        # Удаление пиков-выбросов (значения больше 50% от медианы)
-        def remove_outlier_spikes(values):
-            result = list(values)
-            # Несколько проходов пока есть выбросы
-            for _ in range(10):
-                median_val = np.median(result)
-                threshold = median_val * 4.5  
-                changed = False
-                for i in range(len(result)):
-                    if result[i] > threshold:
-                        # Заменяем на медиану
-                        result[i] = median_val
-                        changed = True
-                if not changed:
-                    break
-            return result
-        
         if remove_spikes:
-            no_prefetch = remove_outlier_spikes(no_prefetch)
-            prefetch = remove_outlier_spikes(prefetch)
+            no_prefetch = _clip_spikes(no_prefetch)
+            prefetch = _clip_spikes(prefetch)
         
         # Сглаживание скользящим средним для уменьшения шума
         if smooth and len(no_prefetch) >= smooth_window:
-            kernel = np.ones(smooth_window) / smooth_window
-            no_prefetch_smooth = np.convolve(np.array(no_prefetch), kernel, mode='valid')
-            prefetch_smooth = np.convolve(np.array(prefetch), kernel, mode='valid')
+            no_prefetch_smooth = _moving_average(no_prefetch, smooth_window)
+            prefetch_smooth = _moving_average(prefetch, smooth_window)
             # Обрезаем offsets чтобы соответствовал сглаженным данным
             offset = (smooth_window - 1) // 2
             offsets = offsets[offset:offset + len(no_prefetch_smooth)]
-            no_prefetch = no_prefetch_smooth.tolist()
-            prefetch = prefetch_smooth.tolist()
+            no_prefetch = no_prefetch_smooth
+            prefetch = prefetch_smooth
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(offsets, no_prefetch, 'r-', linewidth=1.5, label='Без предвыборки')
         ax.plot(offsets, prefetch, 'g-', linewidth=1.5, label='С предвыборкой')
         ax.set_xlabel('Смещение (байт)', fontsize=12)
@@ -1036,7 +1360,6 @@ class HardwareTesterClient:
         ax.legend(loc='upper left')
         
         # Добавляем вставку с параметрами эксперимента
-        params = data.get("parameters", {})
         info_text = (
             f"Параметры эксперимента:\n"
             f"  • Шаг расстояния: {params.get('param1_b', '?')} Б\n"
@@ -1046,28 +1369,25 @@ class HardwareTesterClient:
         ax.text(0.98, 0.98, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='right', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp3_prefetch", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="offset",
-            x_label="Смещение",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Предвыборка",
-            save_path=self._get_save_path("exp3_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="offset",
+                x_label="Смещение",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Предвыборка",
+                save_path=self._get_save_path("exp3_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
 
     def plot_memory_read_optimization(self, data: Dict[str, Any],
                                        save_path: Optional[str] = None,
@@ -1082,8 +1402,10 @@ class HardwareTesterClient:
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
+        params = data.get("parameters", {})
+        conclusions = data.get("conclusions") or {}
+        
         # Вывод выводов
-        conclusions = data.get("conclusions", {})
         if conclusions:
             ratio = conclusions.get("separate_to_optimized_ratio", 0)
             
@@ -1100,11 +1422,10 @@ class HardwareTesterClient:
         self._print_pmu_summary(data, "Эксперимент 4")
         
         # Сохраняем результаты в файл
-        params_exp = data.get("parameters", {})
         self._save_results(
             "Эксперимент 4: Оптимизация чтения оперативной памяти",
-            params_exp,
-            conclusions if conclusions else {},
+            params,
+            conclusions,
             data.get("pmu_summary")
         )
         
@@ -1112,7 +1433,7 @@ class HardwareTesterClient:
         separate = [p["separate_time_us"] for p in data_points]
         optimized = [p["optimized_time_us"] for p in data_points]
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(streams, separate, 'r-', linewidth=1.5, label='Отдельные массивы')
         ax.plot(streams, optimized, 'g-', linewidth=1.5, label='Оптимизированный массив')
         ax.set_xlabel('Количество потоков данных', fontsize=12)
@@ -1122,7 +1443,6 @@ class HardwareTesterClient:
         ax.legend(loc='upper left')
         
         # Добавляем вставку с параметрами эксперимента
-        params = data.get("parameters", {})
         info_text = (
             f"Параметры эксперимента:\n"
             f"  • Размер массива: {params.get('param1_mb', '?')} МБ\n"
@@ -1132,28 +1452,25 @@ class HardwareTesterClient:
         ax.text(0.02, 0.89, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='left', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp4_memory_read_optimization", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="iteration",
-            x_label="Итерация",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Оптимизация чтения памяти",
-            save_path=self._get_save_path("exp4_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="iteration",
+                x_label="Итерация",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Оптимизация чтения памяти",
+                save_path=self._get_save_path("exp4_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
 
     def plot_cache_conflicts(self, data: Dict[str, Any],
                              save_path: Optional[str] = None,
@@ -1168,8 +1485,10 @@ class HardwareTesterClient:
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
+        params = data.get("parameters", {})
+        conclusions = data.get("conclusions") or {}
+        
         # Вывод выводов
-        conclusions = data.get("conclusions", {})
         if conclusions:
             ratio = conclusions.get("conflict_to_no_conflict_ratio", 0)
             
@@ -1186,11 +1505,10 @@ class HardwareTesterClient:
         self._print_pmu_summary(data, "Эксперимент 5")
         
         # Сохраняем результаты в файл
-        params_exp = data.get("parameters", {})
         self._save_results(
             "Эксперимент 5: Конфликты в кэш-памяти",
-            params_exp,
-            conclusions if conclusions else {},
+            params,
+            conclusions,
             data.get("pmu_summary")
         )
         
@@ -1198,7 +1516,7 @@ class HardwareTesterClient:
         conflict = [p["conflict_time_us"] for p in data_points]
         no_conflict = [p["no_conflict_time_us"] for p in data_points]
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(lines, conflict, 'r-', linewidth=1.5, label='С конфликтами')
         ax.plot(lines, no_conflict, 'g-', linewidth=1.5, label='Без конфликтов')
         ax.set_xlabel('Количество линеек', fontsize=12)
@@ -1208,7 +1526,6 @@ class HardwareTesterClient:
         ax.legend(loc='upper left')
         
         # Добавляем вставку с параметрами эксперимента
-        params = data.get("parameters", {})
         info_text = (
             f"Параметры эксперимента:\n"
             f"  • Размер банка кэш-памяти: {params.get('param1_kb', '?')} КБ\n"
@@ -1219,32 +1536,30 @@ class HardwareTesterClient:
         ax.text(0.02, 0.90, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='left', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp5_cache_conflicts", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="stride",
-            x_label="Шаг доступа",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Конфликты кэша",
-            save_path=self._get_save_path("exp5_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="stride",
+                x_label="Шаг доступа",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Конфликты кэша",
+                save_path=self._get_save_path("exp5_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
 
     def plot_sorting_algorithms(self, data: Dict[str, Any],
                                 save_path: Optional[str] = None,
-                                show: bool = True) -> plt.Figure:
+                                show: bool = True,
+                                quiet: bool = False) -> plt.Figure:
         """Строит график сравнения алгоритмов сортировки."""
         if "error" in data:
             console.print(f"[red][[-]][/red] Ошибка в данных: {data['error']}")
@@ -1255,9 +1570,11 @@ class HardwareTesterClient:
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
-        # Вывод выводов
-        conclusions = data.get("conclusions", {})
-        if conclusions:
+        params = data.get("parameters", {})
+        conclusions = data.get("conclusions") or {}
+        
+        # Вывод выводов (quiet — без форматирования Rich для пакетных прогонов)
+        if conclusions and not quiet:
             quick_to_radix = conclusions.get("quicksort_to_radix_ratio", 0)
             quick_to_radix_opt = conclusions.get("quicksort_to_radix_opt_ratio", 0)
             
@@ -1276,20 +1593,20 @@ class HardwareTesterClient:
         self._print_pmu_summary(data, "Эксперимент 6")
         
         # Сохраняем результаты в файл
-        params_exp = data.get("parameters", {})
         self._save_results(
             "Эксперимент 6: Сравнение алгоритмов сортировки",
-            params_exp,
-            conclusions if conclusions else {},
+            params,
+            conclusions,
             data.get("pmu_summary")
         )
         
-        elements = [p["elements"] / (1024 * 1024) for p in data_points]
+        elements = np.fromiter((p["elements"] for p in data_points), dtype=np.float64,
+                               count=len(data_points)) / (1024 * 1024)
         quicksort = [p["quicksort_time_us"] for p in data_points]
         radix = [p["radix_time_us"] for p in data_points]
         radix_opt = [p.get("radix_opt_time_us", 0) for p in data_points]
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(elements, quicksort, 'm-', linewidth=1.5, label='QuickSort')
         ax.plot(elements, radix, 'b-', linewidth=1.5, label='Radix-Counting Sort')
         ax.plot(elements, radix_opt, 'g-', linewidth=1.5, label='Radix-Counting Sort (оптим.)')
@@ -1300,7 +1617,6 @@ class HardwareTesterClient:
         ax.legend(loc='upper left')
         
         # Добавляем вставку с параметрами эксперимента
-        params = data.get("parameters", {})
         info_text = (
             f"Параметры эксперимента:\n"
             f"  • Кол-во элементов: {params.get('param1_m', '?')} М\n"
@@ -1310,28 +1626,25 @@ class HardwareTesterClient:
         ax.text(0.02, 0.84, info_text, transform=ax.transAxes, fontsize=9,
                 verticalalignment='top', horizontalalignment='left', bbox=props)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp6_sorting_algorithms", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         if show:
-            plt.show()
-            plt.close(fig)
-        
-        # Автоматически строим график PMU метрик
-        self.plot_pmu_metrics(
-            data,
-            x_key="size",
-            x_label="Размер массива",
-            metrics=["cache_misses", "branch_misses"],
-            title="PMU: Сортировка",
-            save_path=self._get_save_path("exp6_pmu_metrics") if self.img_dir else None,
-            show=show
-        )
+            self._show_figure(fig)
+        
+        # Автоматически строим график PMU метрик (если есть per-point данные)
+        if _has_pmu_points(data_points):
+            self.plot_pmu_metrics(
+                data,
+                x_key="size",
+                x_label="Размер массива",
+                metrics=["cache_misses", "branch_misses"],
+                title="PMU: Сортировка",
+                save_path=self._get_save_path("exp6_pmu_metrics") if self.img_dir else None,
+                show=show
+            )
         
-        return fig if not show else None
+        return self._finish_figure(fig) if not show else None
 
     def plot_self_modifying_code(self, data: Dict[str, Any],
                                   save_path: Optional[str] = None,
@@ -1352,12 +1665,13 @@ class HardwareTesterClient:
             console.print(f"[red][[-]][/red] Ошибка в данных: {data['error']}")
             return None
             
-        # DEBUG: Print received keys
-        console.print(f"[bold magenta]DEBUG: Received metrics keys: {list(data.keys())}[/bold magenta]")
-        if "jit" in data:
-            console.print(f"[bold magenta]DEBUG: jit data: {data['jit']}[/bold magenta]")
-        if "branching" in data:
-            console.print(f"[bold magenta]DEBUG: branching data: {data['branching']}[/bold magenta]")
+        # Отладочный вывод сырых данных (MEMORYLAB_DEBUG=1)
+        if self._debug:
+            console.print(f"[bold magenta]DEBUG: Received metrics keys: {list(data.keys())}[/bold magenta]")
+            if "jit" in data:
+                console.print(f"[bold magenta]DEBUG: jit data: {data['jit']}[/bold magenta]")
+            if "branching" in data:
+                console.print(f"[bold magenta]DEBUG: branching data: {data['branching']}[/bold magenta]")
         
         # Извлекаем данные
         jit_data = data.get("jit", {})
@@ -1421,36 +1735,47 @@ class HardwareTesterClient:
             console.print("[yellow][[!]][/yellow] Нет сырых данных для графика")
             return None
         
-        fig, ax = plt.subplots(figsize=(12, 6), facecolor='white')
-        
-        # График: Время кадра (линии)
-        if jit_frames:
-            ax.plot(range(len(jit_frames)), jit_frames, 
-                    color='#27ae60', alpha=0.7, linewidth=0.8, label='JIT')
-        if branch_frames:
-            ax.plot(range(len(branch_frames)), branch_frames, 
-                    color='#e74c3c', alpha=0.7, linewidth=0.8, label='Branching')
+        fig, ax = self._get_or_create_axes(figsize=(12, 6), show=show)
+        
+        # График: Время кадра (линии) — обе серии одной коллекцией
+        from matplotlib.collections import LineCollection
+        from matplotlib.lines import Line2D
+        
+        frame_index = np.arange(max(len(jit_frames), len(branch_frames)), dtype=np.float64)
+        
+        series = [(frames, color, label) for frames, color, label in (
+            (jit_frames, '#27ae60', 'JIT'),
+            (branch_frames, '#e74c3c', 'Branching'),
+        ) if frames]
+        segments = []
+        for frames, _, _ in series:
+            xs, ys = frame_index[:len(frames)], np.asarray(frames, dtype=np.float64)
+            # Длинные серии прореживаем: визуально то же, но в разы меньше сегментов
+            if len(frames) > _LTTB_THRESHOLD:
+                xs, ys = _lttb(xs, ys)
+            segments.append(np.column_stack([xs, ys]))
+        colors = [color for _, color, _ in series]
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.8, alpha=0.7,
+                                         rasterized=self._fast_save))
+        ax.autoscale_view()
+        handles = [Line2D([], [], color=color, alpha=0.7, linewidth=0.8, label=label)
+                   for _, color, label in series]
         
         ax.set_xlabel('Номер кадра', fontsize=11)
         ax.set_ylabel('Время кадра (мс)', fontsize=11)
         ax.set_title('Время рендеринга по кадрам', fontsize=12, fontweight='bold')
-        ax.legend(loc='upper right')
+        ax.legend(handles=handles, loc='upper right')
         ax.grid(True, linestyle='--', alpha=0.5)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp7_doom_jit_benchmark", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
             return None
-        return fig
-
-        return fig
+        
+        return self._finish_figure(fig)
 
 
 # ==================== УТИЛИТЫ ====================
@@ -1460,7 +1785,8 @@ async def run_experiment(function_name: str,
                          host: Optional[str] = None,
                          port: int = 8765,
                          plot: bool = True,
-                         save_path: Optional[str] = None) -> Dict[str, Any]:
+                         save_path: Optional[str] = None,
+                         show: bool = True) -> Dict[str, Any]:
     """
     Удобная функция для запуска эксперимента.
     
@@ -1471,27 +1797,46 @@ async def run_experiment(function_name: str,
         port: Порт сервера
         plot: Строить график
         save_path: Путь для сохранения графика
+        show: Показать график на экране. При show=False график строится
+              в фоновом потоке и не блокирует цикл событий asyncio
         
     Returns:
         Результат эксперимента
     """
     client = HardwareTesterClient(host=host, port=port)
+    loop = asyncio.get_running_loop()
+    plot_job = None
     
     try:
         await client.connect()
         result = await client.execute(function_name, params)
         
         if plot and function_name == "memory_stratification":
-            client.plot_memory_stratification(result, save_path=save_path)
+            plot_func = client.plot_memory_stratification
         elif plot and function_name == "self_modifying_code":
-            client.plot_self_modifying_code(result, save_path=save_path)
+            plot_func = client.plot_self_modifying_code
         elif plot:
-            client.plot_generic(result, save_path=save_path)
+            plot_func = client.plot_generic
+        
+        if plot and show:
+            plot_func(result, save_path=save_path)
+        elif plot:
+            # Отрисовка и сохранение идут параллельно с отключением от сервера
+            plot_job = loop.run_in_executor(
+                _PLOT_EXECUTOR,
+                functools.partial(plot_func, result, save_path=save_path, show=False)
+            )
         
         return result
         
     finally:
         await client.disconnect()
+        try:
+            if plot_job is not None:
+                await plot_job
+        finally:
+            # Ожидание записи графиков и остановка пула сохранения — вне цикла событий
+            await loop.run_in_executor(_PLOT_EXECUTOR, client.close)
 
 
 # ==================== MCU CLIENT ====================
@@ -1525,7 +1870,8 @@ class MCUClient(HardwareTesterClient):
     SERVER_NAME = "HardwareTester-MCU"
     
     def __init__(self, host: Optional[str] = None, port: int = DEFAULT_MCU_PORT, 
-                 img_dir: Optional[str] = None, results_file: Optional[str] = None):
+                 img_dir: Optional[str] = None, results_file: Optional[str] = None,
+                 fast_save: bool = False, reuse_figure: bool = False):
         """
         Инициализация клиента для МК.
         
@@ -1534,22 +1880,27 @@ class MCUClient(HardwareTesterClient):
             port: Порт сервера (по умолчанию 8766)
             img_dir: Папка для сохранения графиков
             results_file: Путь к файлу для сохранения результатов
+            fast_save: Быстрое сохранение графиков для пакетных прогонов
+            reuse_figure: Переиспользовать одну фигуру для графиков с show=False
         """
         # По умолчанию подключаемся к localhost т.к. UART-сервер локальный
         if host is None:
             host = "127.0.0.1"
-        super().__init__(host=host, port=port, img_dir=img_dir, results_file=results_file)
+        super().__init__(host=host, port=port, img_dir=img_dir, results_file=results_file,
+                         fast_save=fast_save, reuse_figure=reuse_figure)
         self._mcu_suffix = " (МК)"
         self._file_suffix = "_mcu"
+        # Окончание имени файла вычисляется один раз
+        self._png_suffix = f"{self._file_suffix}.png"
     
-    def _get_save_path(self, name: str, save_path: Optional[str] = None) -> Optional[str]:
+    def _build_save_path(self, name: str, save_path: Optional[str] = None) -> Optional[str]:
         """Добавляет суффикс _mcu к имени файла."""
         if save_path:
             # Вставляем суффикс перед расширением
             base, ext = os.path.splitext(save_path)
             return f"{base}{self._file_suffix}{ext}"
         if self.img_dir:
-            return os.path.join(self.img_dir, f"{name}{self._file_suffix}.png")
+            return os.path.join(self.img_dir, f"{name}{self._png_suffix}")
         return None
     
     def _add_mcu_suffix(self, title: str) -> str:
@@ -1576,11 +1927,18 @@ class MCUClient(HardwareTesterClient):
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
-        steps = [p["step"] if "step" in p else p.get("size_kb", 0) * 1024 for p in data_points]
-        times = [p["time_us"] if "time_us" in p else p.get("time_ns", 0) / 1000 for p in data_points]
-        steps_kb = [s / 1024 if s > 100 else s for s in steps]
+        # Один проход по точкам: столбцы (шаг в байтах, время в мкс)
+        points = np.array(
+            [(p["step"] if "step" in p else p.get("size_kb", 0) * 1024,
+              p["time_us"] if "time_us" in p else p.get("time_ns", 0) / 1000)
+             for p in data_points],
+            dtype=np.float64
+        )
+        steps = points[:, 0]
+        times = points[:, 1]
+        steps_kb = np.where(steps > 100, steps / 1024, steps)
         
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(steps_kb, times, 'b-', linewidth=1.5, label='Время доступа')
         
         ax.set_xlabel('Размер (КБ)', fontsize=12)
@@ -1589,22 +1947,20 @@ class MCUClient(HardwareTesterClient):
                     fontsize=14, fontweight='bold')
         ax.grid(True, linestyle='--', alpha=0.7)
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp1_memory_stratification", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
+            return None
         
-        return fig if not show else None
+        return self._finish_figure(fig)
     
     def plot_list_vs_array(self, data: Dict[str, Any],
                            save_path: Optional[str] = None,
-                           show: bool = True) -> plt.Figure:
+                           show: bool = True,
+                           quiet: bool = False) -> plt.Figure:
         """Строит график с приписком (МК)."""
         if "error" in data:
             console.print(f"[red][[-]][/red] Ошибка в данных: {data['error']}")
@@ -1614,21 +1970,24 @@ class MCUClient(HardwareTesterClient):
         elements = data.get("elements", 0)
         array_time = data.get("array_time_us", 0)
         list_time = data.get("list_time_us", 0)
-        ratio = data.get("list_to_array_ratio", list_time / array_time if array_time else 0)
+        ratio = data.get("list_to_array_ratio")
+        if ratio is None:
+            ratio = list_time / array_time if array_time else 0.0
         
-        # Выводим результаты
-        tbl = Table(show_header=False, box=box.SIMPLE, padding=(0, 1))
-        tbl.add_column("Key", style="bold")
-        tbl.add_column("Value")
-        tbl.add_row("Элементов", str(elements))
-        tbl.add_row("Время работы со списком", f"{list_time:.2f} мкс")
-        tbl.add_row("Время работы с массивом", f"{array_time:.2f} мкс")
-        tbl.add_row("Отношение (список/массив)", f"{ratio:.2f}x")
+        # Выводим результаты (quiet — без форматирования Rich для пакетных прогонов)
+        if not quiet:
+            tbl = Table(show_header=False, box=box.SIMPLE, padding=(0, 1))
+            tbl.add_column("Key", style="bold")
+            tbl.add_column("Value")
+            tbl.add_row("Элементов", str(elements))
+            tbl.add_row("Время работы со списком", f"{list_time:.2f} мкс")
+            tbl.add_row("Время работы с массивом", f"{array_time:.2f} мкс")
+            tbl.add_row("Отношение (список/массив)", f"{ratio:.2f}x")
         
-        console.print(Panel(tbl, title=self._add_mcu_suffix("ВЫВОДЫ: Сравнение списка и массива"), border_style="green"))
+            console.print(Panel(tbl, title=self._add_mcu_suffix("ВЫВОДЫ: Сравнение списка и массива"), border_style="green"))
         
         # Простой bar chart для MCU
-        fig, ax = plt.subplots(figsize=(10, 6), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(10, 6), show=show)
         bars = ax.bar(['Массив', 'Список'], [array_time, list_time], 
                      color=['#2ecc71', '#e74c3c'], width=0.6)
         
@@ -1638,22 +1997,17 @@ class MCUClient(HardwareTesterClient):
         ax.grid(True, linestyle='--', alpha=0.7, axis='y')
         
         # Добавляем значения на столбцах
-        for bar, val in zip(bars, [array_time, list_time]):
-            ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
-                   f'{val:.2f}', ha='center', va='bottom', fontsize=10)
-        
-        plt.tight_layout()
+        ax.bar_label(bars, fmt='%.2f', padding=3, fontsize=10)
         
         actual_save_path = self._get_save_path("exp2_list_vs_array", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
+            return None
         
-        return fig if not show else None
+        return self._finish_figure(fig)
     
     def plot_cache_conflicts(self, data: Dict[str, Any],
                              save_path: Optional[str] = None,
@@ -1668,11 +2022,17 @@ class MCUClient(HardwareTesterClient):
             console.print("[red][[-]][/red] Нет данных для построения графика")
             return None
         
-        lines = [p["line"] for p in data_points]
-        conflict_times = [p["conflict_ns"] for p in data_points]
-        no_conflict_times = [p["no_conflict_ns"] for p in data_points]
-        
-        fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
+        # Один проход по точкам вместо трёх списковых включений
+        n = len(data_points)
+        lines = np.empty(n, dtype=np.int32)
+        conflict_times = np.empty(n, dtype=np.float64)
+        no_conflict_times = np.empty(n, dtype=np.float64)
+        for i, p in enumerate(data_points):
+            lines[i] = p["line"]
+            conflict_times[i] = p["conflict_ns"]
+            no_conflict_times[i] = p["no_conflict_ns"]
+        
+        fig, ax = self._get_or_create_axes(figsize=(12, 7), show=show)
         ax.plot(lines, conflict_times, 'r-', linewidth=1.5, label='С конфликтами', marker='o', markersize=4)
         ax.plot(lines, no_conflict_times, 'g-', linewidth=1.5, label='Без конфликтов', marker='s', markersize=4)
         
@@ -1683,22 +2043,20 @@ class MCUClient(HardwareTesterClient):
         ax.grid(True, linestyle='--', alpha=0.7)
         ax.legend(loc='upper right')
         
-        plt.tight_layout()
-        
         actual_save_path = self._get_save_path("exp5_cache_conflicts", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
+            return None
         
-        return fig if not show else None
+        return self._finish_figure(fig)
     
     def plot_sorting_algorithms(self, data: Dict[str, Any],
                                 save_path: Optional[str] = None,
-                                show: bool = True) -> plt.Figure:
+                                show: bool = True,
+                                quiet: bool = False) -> plt.Figure:
         """Строит график с приписком (МК)."""
         if "error" in data:
             console.print(f"[red][[-]][/red] Ошибка в данных: {data['error']}")
@@ -1712,17 +2070,18 @@ class MCUClient(HardwareTesterClient):
             'Quick': data.get("quick_sort_us", 0),
         }
         
-        # Выводим результаты
-        tbl = Table(show_header=False, box=box.SIMPLE, padding=(0, 1))
-        tbl.add_column("Алгоритм", style="bold")
-        tbl.add_column("Время (мкс)")
-        for name, time in algorithms.items():
-            tbl.add_row(name, f"{time:.2f}")
+        # Выводим результаты (quiet — без форматирования Rich для пакетных прогонов)
+        if not quiet:
+            tbl = Table(show_header=False, box=box.SIMPLE, padding=(0, 1))
+            tbl.add_column("Алгоритм", style="bold")
+            tbl.add_column("Время (мкс)")
+            for name, time in algorithms.items():
+                tbl.add_row(name, f"{time:.2f}")
         
-        console.print(Panel(tbl, title=self._add_mcu_suffix(f"Сортировка {elements} элементов"), border_style="green"))
+            console.print(Panel(tbl, title=self._add_mcu_suffix(f"Сортировка {elements} элементов"), border_style="green"))
         
         # Bar chart
-        fig, ax = plt.subplots(figsize=(10, 6), facecolor='white')
+        fig, ax = self._get_or_create_axes(figsize=(10, 6), show=show)
         colors = ['#e74c3c', '#f39c12', '#3498db', '#2ecc71']
         bars = ax.bar(list(algorithms.keys()), list(algorithms.values()), 
                      color=colors, width=0.6)
@@ -1733,22 +2092,17 @@ class MCUClient(HardwareTesterClient):
         ax.grid(True, linestyle='--', alpha=0.7, axis='y')
         
         # Добавляем значения на столбцах
-        for bar, val in zip(bars, algorithms.values()):
-            ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
-                   f'{val:.0f}', ha='center', va='bottom', fontsize=10)
-        
-        plt.tight_layout()
+        ax.bar_label(bars, fmt='%.0f', padding=3, fontsize=10)
         
         actual_save_path = self._get_save_path("exp6_sorting", save_path)
         if actual_save_path:
-            fig.savefig(actual_save_path, dpi=150, bbox_inches='tight')
-            console.print(f"[green][[+]][/green] График сохранён: {actual_save_path}")
+            self._save_figure(fig, actual_save_path)
         
         if show:
-            plt.show()
-            plt.close(fig)
+            self._show_figure(fig)
+            return None
         
-        return fig if not show else None
+        return self._finish_figure(fig)
     
     def plot_generic(self, data: Dict[str, Any],
                      x_key: str = "step",
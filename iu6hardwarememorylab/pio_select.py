@@ -5,19 +5,36 @@
 
 import os
 import sys
+import functools
+import importlib.util
 import subprocess
-import glob
+import time
+import types
 from pathlib import Path
 
-try:
+# rich импортируется лениво (см. _rich): команде select с --env он не нужен
+RICH_AVAILABLE = importlib.util.find_spec("rich") is not None
+
+
+@functools.lru_cache(maxsize=1)
+def _rich():
+    """Импортирует компоненты rich при первом обращении (None без rich)"""
+    if not RICH_AVAILABLE:
+        return None
     from rich.console import Console
     from rich.panel import Panel
     from rich.table import Table
     from rich.prompt import Prompt, Confirm
-    from rich.progress import Progress, SpinnerColumn, TextColumn
-    RICH_AVAILABLE = True
-except ImportError:
-    RICH_AVAILABLE = False
+    return types.SimpleNamespace(Console=Console, Panel=Panel, Table=Table,
+                                 Prompt=Prompt, Confirm=Confirm)
+
+
+@functools.lru_cache(maxsize=1)
+def _console():
+    """Возвращает общий экземпляр консоли rich (None без rich)"""
+    rich = _rich()
+    return rich.Console() if rich else None
+
 
 # Доступные окружения PlatformIO
 ENVIRONMENTS = {
@@ -120,54 +137,105 @@ ENVIRONMENTS = {
 }
 
 
-def get_serial_ports():
-    """Получает список доступных серийных портов"""
-    ports = []
-    
+def _env_row(key, info):
+    """Формирует строку таблицы rich для платы"""
+    cache_style = "green" if info['cache'] != "Нет" else "dim"
+    return (
+        key,
+        info['name'],
+        info['platform'],
+        info['ram'],
+        f"[{cache_style}]{info['cache']}[/{cache_style}]",
+        info['description']
+    )
+
+
+# Строки меню плат: ENVIRONMENTS не меняется, поэтому форматируются один раз
+_ENV_CHOICES = list(ENVIRONMENTS.keys())
+_ENV_ROWS = tuple(_env_row(key, info) for key, info in ENVIRONMENTS.items())
+_SIMPLE_MENU = "".join([
+    "\n", "=" * 60, "\n",
+    " Выбор микроконтроллера для Memory Lab\n",
+    "=" * 60, "\n\n",
+    f"{'№':>2} | {'Плата':<25} | {'RAM':<10} | {'Кэш':<8}\n",
+    "-" * 60, "\n",
+    *(f"{key:>2} | {info['name']:<25} | {info['ram']:<10} | {info['cache']:<8}\n"
+      for key, info in ENVIRONMENTS.items()),
+    "-" * 60, "\n\n",
+])
+
+
+# Префиксы имён серийных портов в /dev
+_PORT_PREFIXES = (
     # macOS
-    ports.extend(glob.glob('/dev/tty.usbserial*'))
-    ports.extend(glob.glob('/dev/tty.usbmodem*'))
-    ports.extend(glob.glob('/dev/tty.wchusbserial*'))
-    ports.extend(glob.glob('/dev/cu.usbserial*'))
-    ports.extend(glob.glob('/dev/cu.usbmodem*'))
-    ports.extend(glob.glob('/dev/cu.wchusbserial*'))
-    ports.extend(glob.glob('/dev/cu.SLAB_USBtoUART*'))
-    
+    'tty.usbserial', 'tty.usbmodem', 'tty.wchusbserial',
+    'cu.usbserial', 'cu.usbmodem', 'cu.wchusbserial', 'cu.SLAB_USBtoUART',
     # Linux
-    ports.extend(glob.glob('/dev/ttyUSB*'))
-    ports.extend(glob.glob('/dev/ttyACM*'))
-    ports.extend(glob.glob('/dev/ttyAMA*'))
+    'ttyUSB', 'ttyACM', 'ttyAMA',
+)
+# Системные устройства macOS, которые не являются платами (открытие будит Bluetooth)
+_PORT_DENY = (
+    'tty.Bluetooth', 'cu.Bluetooth',
+    'tty.debug-console', 'cu.debug-console',
+)
+
+# Время жизни кэша списка портов (с): порты меняются только при подключении устройства
+_PORT_CACHE_TTL = 2.5
+_PORT_CACHE = {"time": 0.0, "ports": None}
+
+
+def get_serial_ports():
+    """Получает список доступных серийных портов (с кэшированием на _PORT_CACHE_TTL)"""
+    now = time.monotonic()
+    if _PORT_CACHE["ports"] is not None and now - _PORT_CACHE["time"] < _PORT_CACHE_TTL:
+        return list(_PORT_CACHE["ports"])
+    
+    ports = _scan_serial_ports()
+    # В кэше — кортеж, вызывающему — копия: изменение результата не портит кэш
+    _PORT_CACHE.update(time=now, ports=tuple(ports))
+    return ports
+
+
+def invalidate_ports():
+    """Сбрасывает кэш списка портов (например, после переподключения устройства)"""
+    _PORT_CACHE["ports"] = None
+
+
+def _scan_serial_ports():
+    """Сканирует /dev в поисках серийных портов"""
+    ports = []
     
-    # Удаляем дубликаты и сортируем
-    return sorted(set(ports))
+    # Один проход по /dev вместо отдельного glob на каждый шаблон
+    try:
+        with os.scandir('/dev') as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(_PORT_PREFIXES) and not name.startswith(_PORT_DENY):
+                    ports.append('/dev/' + name)
+    except OSError:
+        return []
+    
+    return sorted(ports)
 
 
 def print_simple_menu():
     """Простой вывод меню без rich"""
-    print("\n" + "=" * 60)
-    print(" Выбор микроконтроллера для Memory Lab")
-    print("=" * 60)
-    print()
-    print(f"{'№':>2} | {'Плата':<25} | {'RAM':<10} | {'Кэш':<8}")
-    print("-" * 60)
-    
-    for key, info in ENVIRONMENTS.items():
-        print(f"{key:>2} | {info['name']:<25} | {info['ram']:<10} | {info['cache']:<8}")
-    
-    print("-" * 60)
-    print()
+    # Меню собрано заранее и выводится одной записью
+    sys.stdout.write(_SIMPLE_MENU)
+    sys.stdout.flush()
 
 
 def print_rich_menu(console):
     """Красивый вывод меню с rich"""
+    rich = _rich()
     console.print()
-    console.print(Panel.fit(
+    console.print(rich.Panel.fit(
         "[bold cyan]Выбор микроконтроллера для Memory Lab[/bold cyan]",
         border_style="cyan"
     ))
     console.print()
     
-    table = Table(show_header=True, header_style="bold magenta")
+    table = rich.Table(show_header=True, header_style="bold magenta")
     table.add_column("№", style="dim", width=3)
     table.add_column("Плата", style="cyan", width=25)
     table.add_column("Платформа", width=15)
@@ -175,16 +243,8 @@ def print_rich_menu(console):
     table.add_column("Кэш", width=8)
     table.add_column("Описание", style="dim")
     
-    for key, info in ENVIRONMENTS.items():
-        cache_style = "green" if info['cache'] != "Нет" else "dim"
-        table.add_row(
-            key,
-            info['name'],
-            info['platform'],
-            info['ram'],
-            f"[{cache_style}]{info['cache']}[/{cache_style}]",
-            info['description']
-        )
+    for row in _ENV_ROWS:
+        table.add_row(*row)
     
     console.print(table)
     console.print()
@@ -192,6 +252,7 @@ def print_rich_menu(console):
 
 def print_port_menu(ports, console=None):
     """Выводит меню портов"""
+    rich = _rich()
     if not ports:
         msg = "Не найдено ни одного порта! Подключите устройство."
         if console:
@@ -202,12 +263,12 @@ def print_port_menu(ports, console=None):
     
     if console:
         console.print()
-        console.print(Panel.fit(
+        console.print(rich.Panel.fit(
             "[bold yellow]Доступные порты[/bold yellow]",
             border_style="yellow"
         ))
         
-        table = Table(show_header=True, header_style="bold magenta")
+        table = rich.Table(show_header=True, header_style="bold magenta")
         table.add_column("№", style="dim", width=3)
         table.add_column("Порт", style="cyan")
         
@@ -217,38 +278,43 @@ def print_port_menu(ports, console=None):
         console.print(table)
         console.print()
     else:
-        print("\nДоступные порты:")
-        print("-" * 40)
-        for i, port in enumerate(ports, 1):
-            print(f"  {i}. {port}")
-        print("-" * 40)
-        print()
+        buf = ["\nДоступные порты:\n", "-" * 40, "\n"]
+        buf.extend(f"  {i}. {port}\n" for i, port in enumerate(ports, 1))
+        buf.append("-" * 40 + "\n\n")
+        sys.stdout.write("".join(buf))
+        sys.stdout.flush()
     
     return ports
 
 
+@functools.lru_cache(maxsize=16)
+def _index_choices(n):
+    """Варианты ответа "1".."n" для выбора порта"""
+    return [str(i) for i in range(1, n + 1)]
+
+
 def select_port(ports):
     """Интерактивный выбор порта"""
+    rich = _rich()
     if not ports:
         return None
     
     if len(ports) == 1:
         # Единственный порт — используем его
         if RICH_AVAILABLE:
-            console = Console()
+            console = _console()
             console.print(f"[green]Найден единственный порт:[/green] {ports[0]}")
         else:
             print(f"Найден единственный порт: {ports[0]}")
         return ports[0]
     
     if RICH_AVAILABLE:
-        console = Console()
+        console = _console()
         print_port_menu(ports, console)
         
-        choices = [str(i) for i in range(1, len(ports) + 1)]
-        choice = Prompt.ask(
+        choice = rich.Prompt.ask(
             "[bold green]Выберите номер порта[/bold green]",
-            choices=choices,
+            choices=_index_choices(len(ports)),
             default="1"
         )
     else:
@@ -267,13 +333,14 @@ def select_port(ports):
 
 def select_environment():
     """Интерактивный выбор окружения"""
+    rich = _rich()
     if RICH_AVAILABLE:
-        console = Console()
+        console = _console()
         print_rich_menu(console)
         
-        choice = Prompt.ask(
+        choice = rich.Prompt.ask(
             "[bold green]Выберите номер платы[/bold green]",
-            choices=list(ENVIRONMENTS.keys()),
+            choices=_ENV_CHOICES,
             default="1"
         )
     else:
@@ -291,7 +358,7 @@ def select_environment():
     
     if RICH_AVAILABLE:
         console.print()
-        console.print(Panel(
+        console.print(rich.Panel(
             f"[bold green]Выбрано:[/bold green] {selected['name']}\n"
             f"[dim]Окружение PlatformIO:[/dim] {selected['env']}",
             border_style="green"
@@ -304,18 +371,74 @@ def select_environment():
     return selected['env']
 
 
+def _fingerprint(hardware_mc_dir):
+    """
+    Отпечаток исходников прошивки: (максимальное mtime_ns, количество файлов).
+    
+    Каталоги, начинающиеся с точки (.pio с артефактами сборки, .vscode), пропускаются.
+    """
+    latest = 0
+    count = 0
+    stack = [os.fspath(hardware_mc_dir)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        latest = max(latest, entry.stat().st_mtime_ns)
+                        count += 1
+        except OSError:
+            continue
+    return latest, count
+
+
+# Баннеры rich: при повторах с теми же env/портом переиспользуются готовые Panel
+
+@functools.lru_cache(maxsize=32)
+def _build_banner(env):
+    """Баннер сборки прошивки"""
+    return _rich().Panel.fit(
+        f"[bold cyan]Сборка прошивки[/bold cyan]\n"
+        f"[dim]Окружение:[/dim] {env}",
+        border_style="cyan"
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _upload_banner(env, port):
+    """Баннер загрузки прошивки"""
+    return _rich().Panel.fit(
+        f"[bold yellow]Загрузка прошивки[/bold yellow]\n"
+        f"[dim]Окружение:[/dim] {env}\n"
+        f"[dim]Порт:[/dim] {port or 'авто'}",
+        border_style="yellow"
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _monitor_banner(port):
+    """Баннер UART монитора"""
+    return _rich().Panel.fit(
+        f"[bold magenta]UART Monitor[/bold magenta]\n"
+        f"[dim]Порт:[/dim] {port or 'авто'}\n"
+        f"[dim]Скорость:[/dim] 115200 baud\n"
+        f"[dim]Выход:[/dim] Ctrl+C",
+        border_style="magenta"
+    )
+
+
 def run_build(env, hardware_mc_dir):
     """Запускает сборку"""
     cmd = ["pio", "run", "-e", env]
     
     if RICH_AVAILABLE:
-        console = Console()
+        console = _console()
         console.print()
-        console.print(Panel.fit(
-            f"[bold cyan]Сборка прошивки[/bold cyan]\n"
-            f"[dim]Окружение:[/dim] {env}",
-            border_style="cyan"
-        ))
+        console.print(_build_banner(env))
         console.print()
     else:
         print(f"\n{'='*50}")
@@ -347,14 +470,9 @@ def run_upload(env, port, hardware_mc_dir):
         cmd.extend(["--upload-port", port])
     
     if RICH_AVAILABLE:
-        console = Console()
+        console = _console()
         console.print()
-        console.print(Panel.fit(
-            f"[bold yellow]Загрузка прошивки[/bold yellow]\n"
-            f"[dim]Окружение:[/dim] {env}\n"
-            f"[dim]Порт:[/dim] {port or 'авто'}",
-            border_style="yellow"
-        ))
+        console.print(_upload_banner(env, port))
         console.print()
     else:
         print(f"\n{'='*50}")
@@ -381,22 +499,21 @@ def run_upload(env, port, hardware_mc_dir):
     return ret
 
 
-def run_monitor(port, hardware_mc_dir):
-    """Запускает UART монитор"""
+def run_monitor(port, hardware_mc_dir, exec_replace=False):
+    """
+    Запускает UART монитор.
+    
+    При exec_replace=True текущий процесс заменяется на pio (os.execvp):
+    Python не висит в памяти всю сессию монитора, но и код возврата не возвращается.
+    """
     cmd = ["pio", "device", "monitor", "-b", "115200"]
     if port:
         cmd.extend(["-p", port])
     
     if RICH_AVAILABLE:
-        console = Console()
+        console = _console()
         console.print()
-        console.print(Panel.fit(
-            f"[bold magenta]UART Monitor[/bold magenta]\n"
-            f"[dim]Порт:[/dim] {port or 'авто'}\n"
-            f"[dim]Скорость:[/dim] 115200 baud\n"
-            f"[dim]Выход:[/dim] Ctrl+C",
-            border_style="magenta"
-        ))
+        console.print(_monitor_banner(port))
         console.print()
     else:
         print(f"\n{'='*50}")
@@ -405,6 +522,11 @@ def run_monitor(port, hardware_mc_dir):
         print(f" Выход: Ctrl+C")
         print(f"{'='*50}\n")
     
+    if exec_replace:
+        sys.stdout.flush()
+        os.chdir(hardware_mc_dir)
+        os.execvp(cmd[0], cmd)
+    
     return subprocess.call(cmd, cwd=hardware_mc_dir)
 
 
@@ -417,11 +539,13 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
     - Если МК тот же — сразу к выбору порта
     - Если порт тот же — показ ошибки и повтор
     """
-    console = Console() if RICH_AVAILABLE else None
+    rich = _rich()
+    console = _console()
     
     last_env = initial_env
     last_port = initial_port
     last_build_env = None  # Для какого env была последняя успешная сборка
+    last_build_fp = None  # Отпечаток исходников на момент этой сборки
     
     while True:
         # === Выбор МК ===
@@ -431,7 +555,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
             # Спрашиваем: использовать предыдущий МК?
             if RICH_AVAILABLE:
                 console.print()
-                use_same = Confirm.ask(
+                use_same = rich.Confirm.ask(
                     f"[yellow]Использовать тот же МК ({last_env})?[/yellow]",
                     default=True
                 )
@@ -449,13 +573,14 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
                 env = select_environment()
                 last_port = None  # Сбрасываем порт при смене МК
         
-        # === Сборка (только если МК изменился) ===
-        if last_build_env != env:
+        # === Сборка (только если изменился МК или исходники) ===
+        build_fp = _fingerprint(hardware_mc_dir)
+        if (last_build_env, last_build_fp) != (env, build_fp):
             ret = run_build(env, hardware_mc_dir)
             if ret != 0:
                 if RICH_AVAILABLE:
                     console.print()
-                    retry = Confirm.ask("[red]Ошибка сборки. Попробовать снова?[/red]", default=True)
+                    retry = rich.Confirm.ask("[red]Ошибка сборки. Попробовать снова?[/red]", default=True)
                 else:
                     answer = input("Ошибка сборки. Попробовать снова? [Y/n]: ").strip().lower()
                     retry = answer in ('', 'y', 'yes', 'д', 'да')
@@ -467,6 +592,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
                     return ret
             
             last_build_env = env
+            last_build_fp = build_fp
         else:
             if RICH_AVAILABLE:
                 console.print(f"[dim]Сборка для {env} уже выполнена, пропускаем...[/dim]")
@@ -474,7 +600,12 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
                 print(f"Сборка для {env} уже выполнена, пропускаем...")
         
         # === Выбор порта ===
-        ports = get_serial_ports()
+        # Если предыдущий порт на месте, хватает одного stat(); полный скан /dev —
+        # только когда порт пропал или пользователь от него откажется
+        if last_port and os.path.exists(last_port):
+            ports = [last_port]
+        else:
+            ports = get_serial_ports()
         
         if not ports:
             if RICH_AVAILABLE:
@@ -485,6 +616,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
                 print("Подключите устройство и нажмите Enter...")
             
             input()
+            invalidate_ports()
             last_env = env
             continue
         
@@ -492,7 +624,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
             # Предыдущий порт всё ещё доступен
             if RICH_AVAILABLE:
                 console.print()
-                use_same_port = Confirm.ask(
+                use_same_port = rich.Confirm.ask(
                     f"[yellow]Использовать тот же порт ({last_port})?[/yellow]",
                     default=True
                 )
@@ -503,7 +635,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
             if use_same_port:
                 port = last_port
             else:
-                port = select_port(ports)
+                port = select_port(get_serial_ports())
         else:
             port = select_port(ports)
         
@@ -523,7 +655,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
             # Тот же порт и МК — показываем ошибку
             if RICH_AVAILABLE:
                 console.print()
-                console.print(Panel(
+                console.print(rich.Panel(
                     "[bold red]Загрузка не удалась![/bold red]\n\n"
                     "Возможные причины:\n"
                     "• Неправильный порт\n"
@@ -547,7 +679,7 @@ def interactive_upload_loop(hardware_mc_dir, initial_env=None, initial_port=None
         # Спрашиваем о повторе
         if RICH_AVAILABLE:
             console.print()
-            retry = Confirm.ask("[yellow]Попробовать снова?[/yellow]", default=True)
+            retry = rich.Confirm.ask("[yellow]Попробовать снова?[/yellow]", default=True)
         else:
             answer = input("Попробовать снова? [Y/n]: ").strip().lower()
             retry = answer in ('', 'y', 'yes', 'д', 'да')
@@ -618,7 +750,7 @@ def main():
             ports = get_serial_ports()
             port = select_port(ports)
         
-        return run_monitor(port, hardware_mc_dir)
+        return run_monitor(port, hardware_mc_dir, exec_replace=True)
     
     elif args.command == "all":
         # Интерактивный цикл загрузки
@@ -632,7 +764,7 @@ def main():
             return result
         
         # Монитор после успешной загрузки
-        return run_monitor(port, hardware_mc_dir)
+        return run_monitor(port, hardware_mc_dir, exec_replace=True)
     
     return 0
 
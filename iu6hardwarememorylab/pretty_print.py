@@ -5,6 +5,8 @@
 """
 
 import sys
+import functools
+import unicodedata
 
 # ANSI цвета для fallback
 class Colors:
@@ -16,77 +18,86 @@ class Colors:
     DIM = '\033[2m'
     RESET = '\033[0m'
 
-try:
-    from rich.console import Console
-    from rich.panel import Panel
-    console = Console()
-    HAS_RICH = True
-except ImportError:
-    HAS_RICH = False
+@functools.lru_cache(maxsize=1)
+def _get_console():
+    """Возвращает консоль rich (импорт при первом вызове) или None без rich."""
+    try:
+        from rich.console import Console
+    except ImportError:
+        return None
+    return Console()
+
+# Классы East Asian Width, занимающие две колонки
+_WIDE = frozenset(('W', 'F'))
 
+@functools.lru_cache(maxsize=256)
 def _text_width(text: str) -> int:
     """Вычисляет визуальную ширину строки."""
-    try:
-        import unicodedata
-        width = 0
-        for char in text:
-            # East Asian Wide = 2, остальные = 1
-            if unicodedata.east_asian_width(char) in ('W', 'F'):
-                width += 2
-            else:
-                width += 1
-        return width
-    except Exception:
-        return len(text)
+    # East Asian Wide = 2, остальные = 1
+    eaw = unicodedata.east_asian_width
+    return sum(2 if eaw(char) in _WIDE else 1 for char in text)
 
 def print_header(title: str):
     """Выводит заголовок секции."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
+        from rich.panel import Panel
         console.print(Panel.fit(title, border_style="cyan"))
     else:
-        width = _text_width(title)
-        line = "─" * (width + 2)
-        padding = " " * (width - len(title) + len(title))  # для выравнивания
-        print(f"{Colors.CYAN}╭{line}╮{Colors.RESET}")
-        print(f"{Colors.CYAN}│{Colors.RESET} {Colors.BOLD}{title}{Colors.RESET} {Colors.CYAN}│{Colors.RESET}")
-        print(f"{Colors.CYAN}╰{line}╯{Colors.RESET}")
+        line = "─" * (_text_width(title) + 2)
+        sys.stdout.write(
+            f"{Colors.CYAN}╭{line}╮{Colors.RESET}\n"
+            f"{Colors.CYAN}│{Colors.RESET} {Colors.BOLD}{title}{Colors.RESET} {Colors.CYAN}│{Colors.RESET}\n"
+            f"{Colors.CYAN}╰{line}╯{Colors.RESET}\n"
+        )
 
 def print_success(message: str):
     """Выводит сообщение об успехе."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
         console.print(f"[green][[+]][/green] {message}")
     else:
         print(f"{Colors.GREEN}[+]{Colors.RESET} {message}")
 
 def print_info(message: str):
     """Выводит информационное сообщение."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
         console.print(f"[cyan][[*]][/cyan] {message}")
     else:
         print(f"{Colors.CYAN}[*]{Colors.RESET} {message}")
 
 def print_warning(message: str):
     """Выводит предупреждение."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
         console.print(f"[yellow][[!]][/yellow] {message}")
     else:
         print(f"{Colors.YELLOW}[!]{Colors.RESET} {message}")
 
 def print_error(message: str):
     """Выводит ошибку."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
         console.print(f"[red][[-]][/red] {message}")
     else:
         print(f"{Colors.RED}[-]{Colors.RESET} {message}")
 
+# Рамка «Готово!» для ANSI fallback (не меняется)
+_DONE_BOX = (
+    f"{Colors.GREEN}╭─────────╮{Colors.RESET}\n"
+    f"{Colors.GREEN}│{Colors.RESET} {Colors.BOLD}Готово!{Colors.RESET} {Colors.GREEN}│{Colors.RESET}\n"
+    f"{Colors.GREEN}╰─────────╯{Colors.RESET}\n"
+)
+
 def print_done():
     """Выводит сообщение о завершении."""
-    if HAS_RICH:
+    console = _get_console()
+    if console:
+        from rich.panel import Panel
         console.print(Panel.fit("Готово!", border_style="green"))
     else:
-        print(f"{Colors.GREEN}╭────────╮{Colors.RESET}")
-        print(f"{Colors.GREEN}│{Colors.RESET} {Colors.BOLD}Готово!{Colors.RESET} {Colors.GREEN}│{Colors.RESET}")
-        print(f"{Colors.GREEN}╰────────╯{Colors.RESET}")
+        sys.stdout.write(_DONE_BOX)
 
 def print_line():
     """Выводит разделительную линию."""
@@ -19,6 +19,7 @@ import sys
 import argparse
 import glob
 import time
+import queue
 import threading
 from pathlib import Path
 
@@ -35,6 +36,45 @@ try:
 except ImportError:
     SERIAL_AVAILABLE = False
 
+try:
+    import orjson
+
+    def _loads(payload):
+        """Разбирает JSON через orjson; нестандартные значения (NaN, Infinity) — через json"""
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return json.loads(payload)
+
+    def _decode_json(payload: bytearray) -> str:
+        """
+        Проверяет JSON из байт UART и возвращает его текст.
+        
+        orjson разбирает байты напрямую, текст декодируется один раз для ответа.
+        Если в байтах есть невалидный UTF-8 (шум на линии), ответ МК не
+        отбрасывается: такие байты пропускаются и проверяется уже текст.
+        """
+        try:
+            _loads(payload)
+        except ValueError:
+            text = payload.decode('utf-8', errors='ignore')
+            _loads(text)
+            return text
+        return payload.decode('utf-8')
+except ImportError:
+    _loads = json.loads
+
+    def _decode_json(payload: bytearray) -> str:
+        """
+        Проверяет JSON из байт UART и возвращает его текст.
+        
+        Байты декодируются один раз с errors='ignore': случайный невалидный
+        байт (шум на линии) не должен делать весь ответ МК непригодным.
+        """
+        text = payload.decode('utf-8', errors='ignore')
+        json.loads(text)
+        return text
+
 try:
     from rich.console import Console
     from rich.panel import Panel
@@ -50,6 +90,25 @@ DEFAULT_BAUD_RATE = 115200
 SERVER_NAME = "HardwareTester-MCU"
 SERVER_VERSION = "1.0.0"
 
+# Байты, значимые для поиска JSON в потоке UART
+_OPEN_BRACE = ord('{')
+_CLOSE_BRACE = ord('}')
+_QUOTE = ord('"')
+_BACKSLASH = ord('\\')
+
+# Запас (сек) сверх таймаута чтения, после которого ответ потока чтения не ждём
+_READ_MARGIN = 5.0
+
+# Эксперименты, доступные на МК
+_EXPERIMENTS = (
+    {"name": "memory_stratification", "description": "Исследование расслоения памяти. Команда: 1"},
+    {"name": "list_vs_array", "description": "Сравнение списка и массива. Команда: 2"},
+    {"name": "prefetch", "description": "Исследование предвыборки. Команда: 3"},
+    {"name": "memory_read_optimization", "description": "Оптимизация чтения памяти. Команда: 4"},
+    {"name": "cache_conflicts", "description": "Конфликты в кэш-памяти. Команда: 5"},
+    {"name": "sorting_algorithms", "description": "Сравнение алгоритмов сортировки. Команда: 6"},
+)
+
 
 class UARTBridge:
     """Мост между UART и WebSocket"""
@@ -59,8 +118,13 @@ class UARTBridge:
         self.baud_rate = baud_rate
         self.serial = None
         self.connected = False
-        self.response_buffer = ""
+        # Буфер ответа переиспользуется между чтениями (читает только поток _reader_loop)
+        self._buf = bytearray()
         self.lock = threading.Lock()
+        # Выделенный поток чтения UART (см. start_reader)
+        self._loop = None
+        self._read_requests = queue.SimpleQueue()
+        self._reader = None
     
     def connect(self) -> bool:
         """Подключается к последовательному порту"""
@@ -68,7 +132,7 @@ class UARTBridge:
             self.serial = serial.Serial(
                 port=self.serial_port,
                 baudrate=self.baud_rate,
-                timeout=0.1,
+                timeout=0.05,  # read() ждёт первый байт не дольше 50 мс
                 write_timeout=1
             )
             self.connected = True
@@ -83,20 +147,24 @@ class UARTBridge:
     
     def disconnect(self):
         """Отключается от порта"""
+        if self._reader is not None:
+            self._read_requests.put(None)  # Останавливаем поток чтения
+            self._reader = None
         if self.serial and self.serial.is_open:
             self.serial.close()
         self.connected = False
     
-    def send_command(self, cmd: str) -> bool:
-        """Отправляет команду на МК"""
+    def send_command(self, cmd) -> bool:
+        """Отправляет команду на МК (str или уже закодированные bytes)"""
         if not self.connected or not self.serial:
             return False
         
         try:
+            data = cmd if isinstance(cmd, bytes) else cmd.encode('utf-8')
+            # Команда — один символ для меню МК; драйвер отправит его сам,
+            # ждать опустошения FIFO (flush) не нужно
             with self.lock:
-                # Отправляем команду (один символ для меню МК)
-                self.serial.write(cmd.encode('utf-8'))
-                self.serial.flush()
+                self.serial.write(data)
             return True
         except Exception as e:
             print(f"[UART] Ошибка отправки: {e}")
@@ -105,110 +173,194 @@ class UARTBridge:
     def read_response(self, timeout: float = 30.0) -> str:
         """
         Читает ответ от МК до получения полного JSON объекта.
+        
+        Байты разбираются за один проход по мере поступления: отслеживаются
+        глубина фигурных скобок и строки JSON (скобки внутри строк не считаются),
+        а json.loads вызывается один раз — когда объект закрылся.
         """
         if not self.connected or not self.serial:
             return '{"error": "Not connected"}'
         
-        start_time = time.time()
-        buffer = ""
-        json_started = False
-        brace_count = 0
+        deadline = time.monotonic() + timeout
+        buffer = self._buf
+        buffer.clear()
+        scanned = 0      # Сколько байт буфера уже разобрано
+        start_idx = -1   # Начало текущего JSON объекта в буфере
+        last_close = -1  # Последняя закрывающая } вне строк
+        depth = 0
+        in_string = False
+        escape = False
         
-        while time.time() - start_time < timeout:
+        while time.monotonic() < deadline:
             try:
-                if self.serial.in_waiting > 0:
-                    data = self.serial.read(self.serial.in_waiting)
-                    text = data.decode('utf-8', errors='ignore')
-                    buffer += text
+                # Блокируемся в драйвере до первого байта (не дольше serial.timeout),
+                # затем забираем всё, что уже накоплено
+                chunk = self.serial.read(max(1, self.serial.in_waiting))
+                if chunk:
+                    buffer.extend(chunk)
                     
-                    # Ищем начало JSON
-                    for char in text:
-                        if char == '{':
-                            if not json_started:
-                                json_started = True
-                                # Обрезаем всё до первой {
-                                idx = buffer.find('{')
-                                buffer = buffer[idx:]
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                        
-                        # JSON завершён
-                        if json_started and brace_count == 0:
-                            # Ищем конец JSON в буфере
-                            depth = 0
-                            for i, c in enumerate(buffer):
-                                if c == '{':
-                                    depth += 1
-                                elif c == '}':
-                                    depth -= 1
-                                    if depth == 0:
-                                        json_str = buffer[:i+1]
-                                        try:
-                                            # Проверяем валидность JSON
-                                            json.loads(json_str)
-                                            return json_str
-                                        except json.JSONDecodeError:
-                                            # Продолжаем читать
-                                            break
-                else:
-                    time.sleep(0.01)
+                    # Разбираем только новые байты
+                    for i in range(scanned, len(buffer)):
+                        byte = buffer[i]
+                        if in_string:
+                            if escape:
+                                escape = False
+                            elif byte == _BACKSLASH:
+                                escape = True
+                            elif byte == _QUOTE:
+                                in_string = False
+                        elif byte == _OPEN_BRACE:
+                            if depth == 0:
+                                start_idx = i
+                            depth += 1
+                        elif depth == 0:
+                            continue  # Текст вне JSON (меню МК и т.п.)
+                        elif byte == _QUOTE:
+                            in_string = True
+                        elif byte == _CLOSE_BRACE:
+                            last_close = i
+                            depth -= 1
+                            if depth == 0:
+                                try:
+                                    # Проверяем валидность JSON; срез bytearray — единственная копия
+                                    return _decode_json(buffer[start_idx:i + 1])
+                                except ValueError:
+                                    # Не JSON — ищем следующий объект
+                                    start_idx = -1
+                    scanned = len(buffer)
             except Exception as e:
                 print(f"[UART] Ошибка чтения: {e}")
                 break
         
-        # Таймаут — возвращаем что есть
-        if buffer:
-            # Пытаемся извлечь JSON
+        # Таймаут — пытаемся извлечь JSON по уже известным границам
+        if start_idx >= 0 and last_close > start_idx:
             try:
-                start = buffer.find('{')
-                if start >= 0:
-                    end = buffer.rfind('}')
-                    if end > start:
-                        json_str = buffer[start:end+1]
-                        json.loads(json_str)  # Проверка
-                        return json_str
-            except:
+                return _decode_json(buffer[start_idx:last_close + 1])
+            except ValueError:
                 pass
         
-        return '{"error": "Timeout waiting for response", "partial": "' + buffer[:200].replace('"', '\\"') + '"}'
+        # Как и раньше, в partial попадает текст начиная с первой {
+        first_open = max(buffer.find(_OPEN_BRACE), 0)
+        return json.dumps({
+            "error": "Timeout waiting for response",
+            "partial": buffer[first_open:first_open + 200].decode('utf-8', errors='ignore')
+        })
+    
+    def start_reader(self, loop: asyncio.AbstractEventLoop):
+        """
+        Запускает выделенный поток чтения UART.
+        
+        Поток по одному выполняет запросы на чтение (request_response)
+        и передаёт каждый ответ МК в Future своего запроса в цикле loop.
+        """
+        self._loop = loop
+        self._reader = threading.Thread(target=self._reader_loop, name="uart-reader", daemon=True)
+        self._reader.start()
+    
+    def request_response(self, timeout: float) -> asyncio.Future:
+        """
+        Просит поток чтения дождаться ответа МК (не дольше timeout секунд).
+        
+        Returns:
+            Future, который получит ответ именно этого запроса. Если Future
+            отменён (клиент отключился), ответ МК будет прочитан и отброшен.
+        """
+        future = self._loop.create_future()
+        self._read_requests.put((timeout, future))
+        return future
+    
+    @staticmethod
+    def _resolve(future: asyncio.Future, response: str):
+        """Передаёт ответ в Future, если его ещё ждут"""
+        if not future.done():
+            future.set_result(response)
+    
+    def _reader_loop(self):
+        """Цикл потока чтения UART"""
+        while True:
+            request = self._read_requests.get()
+            if request is None:
+                break
+            timeout, future = request
+            try:
+                response = self.read_response(timeout)
+            except Exception as e:
+                # Поток не должен умирать (например, при отключении USB):
+                # запрос получает ошибку, следующие обрабатываются как обычно
+                print(f"[UART] Ошибка чтения: {e}")
+                response = json.dumps({"error": f"UART read error: {e}"})
+            try:
+                self._loop.call_soon_threadsafe(self._resolve, future, response)
+            except RuntimeError:
+                break  # Цикл событий уже закрыт
     
     def get_available_experiments(self) -> list:
         """Возвращает список доступных экспериментов МК"""
-        return [
-            {"name": "memory_stratification", "description": "Исследование расслоения памяти. Команда: 1"},
-            {"name": "list_vs_array", "description": "Сравнение списка и массива. Команда: 2"},
-            {"name": "prefetch", "description": "Исследование предвыборки. Команда: 3"},
-            {"name": "memory_read_optimization", "description": "Оптимизация чтения памяти. Команда: 4"},
-            {"name": "cache_conflicts", "description": "Конфликты в кэш-памяти. Команда: 5"},
-            {"name": "sorting_algorithms", "description": "Сравнение алгоритмов сортировки. Команда: 6"},
-        ]
+        return list(_EXPERIMENTS)
 
 
 class MCUWebSocketServer:
     """WebSocket сервер для МК"""
     
+    # Маппинг имён функций на команды МК
+    _CMD_MAP = {
+        "memory_stratification": "1",
+        "list_vs_array": "2",
+        "prefetch": "3",
+        "memory_read_optimization": "4",
+        "cache_conflicts": "5",
+        "sorting_algorithms": "6",
+        "all": "a",
+    }
+    # Те же команды, закодированные один раз
+    _CMD_BYTES = {name: code.encode('utf-8') for name, code in _CMD_MAP.items()}
+    _CANCEL_BYTES = b'\x03'
+    
     def __init__(self, uart_bridge: UARTBridge, ws_port: int = DEFAULT_WS_PORT):
         self.bridge = uart_bridge
         self.ws_port = ws_port
-        self.clients = set()
+        # Команды к МК выполняются строго по очереди: ответ не содержит id запроса.
+        # Lock создаётся в start(): до Python 3.10 он привязывается к текущему циклу
+        self._uart_lock = None
+        
+        # Ответы, не зависящие от запроса, сериализуются один раз
+        self._welcome_json = json.dumps({
+            "type": "welcome",
+            "serverName": SERVER_NAME,
+            "version": SERVER_VERSION,
+            "message": "Connected to MCU via UART",
+            "uart_port": uart_bridge.serial_port,
+            "baud_rate": uart_bridge.baud_rate
+        })
+        self._list_json = json.dumps({"functions": uart_bridge.get_available_experiments()})
+        # info зависит только от состояния подключения к UART
+        self._info_json = {
+            connected: json.dumps({
+                "serverName": SERVER_NAME,
+                "version": SERVER_VERSION,
+                "port": ws_port,
+                "uart_port": uart_bridge.serial_port,
+                "connected": connected
+            })
+            for connected in (False, True)
+        }
+        
+        # Обработчики действий клиента
+        self._dispatch = {
+            "list": self._do_list,
+            "info": self._do_info,
+            "execute": self._do_execute,
+            "cancel": self._do_cancel,
+            "raw": self._do_raw,
+        }
     
     async def handle_client(self, websocket, path=None):
         """Обработчик WebSocket соединения"""
-        self.clients.add(websocket)
         client_info = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
         print(f"[WS] Клиент подключен: {client_info}")
         
         # Отправляем приветствие
-        welcome = {
-            "type": "welcome",
-            "serverName": SERVER_NAME,
-            "version": SERVER_VERSION,
-            "message": "Connected to MCU via UART",
-            "uart_port": self.bridge.serial_port,
-            "baud_rate": self.bridge.baud_rate
-        }
-        await websocket.send(json.dumps(welcome))
+        await websocket.send(self._welcome_json)
         
         try:
             async for message in websocket:
@@ -216,85 +368,70 @@ class MCUWebSocketServer:
                 await websocket.send(response)
         except websockets.exceptions.ConnectionClosed:
             print(f"[WS] Клиент отключен: {client_info}")
-        finally:
-            self.clients.discard(websocket)
     
     async def process_command(self, message: str) -> str:
         """Обрабатывает команду от клиента"""
         try:
-            cmd = json.loads(message)
+            cmd = _loads(message)
         except json.JSONDecodeError:
             return json.dumps({"error": "Invalid JSON"})
         
         action = cmd.get("action", "")
+        handler = self._dispatch.get(action)
+        if handler is None:
+            return json.dumps({"error": f"Unknown action: {action}"})
+        return await handler(cmd)
+    
+    async def _do_list(self, cmd: dict) -> str:
+        """Список функций"""
+        return self._list_json
+    
+    async def _do_info(self, cmd: dict) -> str:
+        """Информация о сервере"""
+        return self._info_json[bool(self.bridge.connected)]
+    
+    async def _do_execute(self, cmd: dict) -> str:
+        """Выполнение эксперимента"""
+        func_name = cmd.get("function", "")
         
-        if action == "list":
-            # Список функций
-            functions = self.bridge.get_available_experiments()
-            return json.dumps({"functions": functions})
+        uart_cmd = self._CMD_BYTES.get(func_name)
+        if not uart_cmd:
+            return json.dumps({"error": f"Unknown function: {func_name}"})
         
-        elif action == "info":
-            # Информация о сервере
-            return json.dumps({
-                "serverName": SERVER_NAME,
-                "version": SERVER_VERSION,
-                "port": self.ws_port,
-                "uart_port": self.bridge.serial_port,
-                "connected": self.bridge.connected
-            })
-        
-        elif action == "execute":
-            # Выполнение эксперимента
-            func_name = cmd.get("function", "")
-            
-            # Маппинг имён функций на команды МК
-            cmd_map = {
-                "memory_stratification": "1",
-                "list_vs_array": "2",
-                "prefetch": "3",
-                "memory_read_optimization": "4",
-                "cache_conflicts": "5",
-                "sorting_algorithms": "6",
-                "all": "a",
-            }
-            
-            uart_cmd = cmd_map.get(func_name)
-            if not uart_cmd:
-                return json.dumps({"error": f"Unknown function: {func_name}"})
-            
-            print(f"[MCU] Отправка команды: {uart_cmd} ({func_name})")
-            
+        # Читаем ответ (с большим таймаутом для длительных экспериментов)
+        timeout = cmd.get("params", {}).get("timeout", 60)
+        async with self._uart_lock:
             # Отправляем команду на МК
+            print(f"[MCU] Отправка команды: {self._CMD_MAP[func_name]} ({func_name})")
             if not self.bridge.send_command(uart_cmd):
                 return json.dumps({"error": "Failed to send command to MCU"})
-            
-            # Читаем ответ (с большим таймаутом для длительных экспериментов)
-            timeout = cmd.get("params", {}).get("timeout", 60)
-            response = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: self.bridge.read_response(timeout)
-            )
-            
-            print(f"[MCU] Ответ получен: {len(response)} байт")
-            return response
+            response = await self._read_uart(timeout)
         
-        elif action == "cancel":
-            # Отмена — отправляем Ctrl+C
-            self.bridge.send_command('\x03')
-            return json.dumps({"status": "cancelling", "message": "Cancel sent to MCU"})
-        
-        elif action == "raw":
-            # Сырая команда UART
-            raw_cmd = cmd.get("command", "")
-            if raw_cmd:
+        print(f"[MCU] Ответ получен: {len(response)} байт")
+        return response
+    
+    async def _do_cancel(self, cmd: dict) -> str:
+        """Отмена — отправляем Ctrl+C"""
+        self.bridge.send_command(self._CANCEL_BYTES)
+        return json.dumps({"status": "cancelling", "message": "Cancel sent to MCU"})
+    
+    async def _do_raw(self, cmd: dict) -> str:
+        """Сырая команда UART"""
+        raw_cmd = cmd.get("command", "")
+        if raw_cmd:
+            async with self._uart_lock:
                 self.bridge.send_command(raw_cmd)
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None, lambda: self.bridge.read_response(10)
-                )
-                return response
-            return json.dumps({"error": "No command specified"})
-        
-        else:
-            return json.dumps({"error": f"Unknown action: {action}"})
+                return await self._read_uart(10)
+        return json.dumps({"error": "No command specified"})
+    
+    async def _read_uart(self, timeout: float) -> str:
+        """Ждёт ответ МК из потока чтения UART"""
+        future = self.bridge.request_response(timeout)
+        try:
+            # Запас на случай, если поток чтения завис или завершился
+            return await asyncio.wait_for(future, timeout + _READ_MARGIN)
+        except asyncio.TimeoutError:
+            return json.dumps({"error": "UART reader did not respond"})
     
     async def start(self):
         """Запускает WebSocket сервер"""
@@ -304,11 +441,23 @@ class MCUWebSocketServer:
         print(f" UART Port: {self.bridge.serial_port}")
         print(f" Baud Rate: {self.bridge.baud_rate}")
         print(f" WebSocket: ws://localhost:{self.ws_port}")
+        print(" Сжатие:    выкл. (ответы МК малы, сервер локальный)")
         print(f"{'='*50}")
         print(" Ожидание подключений...")
         print()
         
-        async with websockets.serve(self.handle_client, "0.0.0.0", self.ws_port):
+        self._uart_lock = asyncio.Lock()
+        self.bridge.start_reader(asyncio.get_running_loop())
+        
+        # permessage-deflate отключён: для небольших JSON с МК сжатие только тратит CPU
+        async with websockets.serve(
+            self.handle_client, "0.0.0.0", self.ws_port,
+            compression=None,
+            max_size=2**20,
+            ping_interval=20,
+            ping_timeout=20,
+            write_limit=2**16,
+        ):
             await asyncio.Future()  # Бесконечное ожидание
 
 
@@ -3,16 +3,24 @@
 Скрипт для автоматической перекомпиляции отчёта при изменении файлов.
 
 Отслеживает:
-- report/results.txt - перегенерирует main.typ и компилирует PDF
-- report/img/ - компилирует PDF
-- report/main.typ и другие .typ файлы - компилирует PDF
+- report/results.txt - перегенерирует main.typ
+- report/.report_config.json - перегенерирует main.typ и меняет имя PDF
+
+Сам PDF пересобирает долгоживущий процесс `typst watch`: он следит за
+main.typ, img/ и прочими зависимостями и держит кэши шрифтов и разобранных
+файлов между пересборками.
 """
 
+import json
+import os
 import subprocess
 import sys
 import time
+import threading
+import traceback
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Optional
 
 try:
     from watchdog.observers import Observer
@@ -39,6 +47,14 @@ except ImportError:
     console = FallbackConsole()
     Panel = None
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from .generatereport import generate_report
+
 
 class ReportWatcher(FileSystemEventHandler):
     """Обработчик событий файловой системы для отчёта."""
@@ -50,85 +66,142 @@ class ReportWatcher(FileSystemEventHandler):
         self.img_dir = self.report_dir / "img"
         self.main_file = self.report_dir / "main.typ"
         self.typst_bin = typst_bin
-        self.last_compile_time = 0
-        self.cooldown = 1.0
+        self.config_file = self.report_dir / ".report_config.json"
+        # Строковые пути для on_modified: сравниваем src_path без создания Path
+        self._results_path_str = os.fspath(self.results_file)
+        self._config_path_str = os.fspath(self.config_file)
+        # Кэш конфига и пути к PDF; ключ — st_mtime_ns файла (None — файла нет)
+        self._config_mtime: Optional[int] = None
+        self._cached_config: Optional[Dict[str, str]] = None
+        self._cached_pdf_path: Optional[Path] = None
+        # Флаг накопленной работы: обработчик событий только выставляет его,
+        # а main() выполняет работу один раз на серию сохранений (см. process_pending)
+        self._dirty_regen = threading.Event()
+        self._typst_proc: Optional[subprocess.Popen] = None
         
         # Определяем имя PDF из конфига
         self.pdf_file = self._get_pdf_path()
     
-    def _get_pdf_path(self) -> Path:
-        """Возвращает путь к PDF файлу на основе конфига."""
+    def _load_title_config(self) -> Optional[Dict[str, str]]:
+        """
+        Загружает конфигурацию титульной страницы из папки отчёта.
+        
+        Файл перечитывается, только если изменился его st_mtime_ns.
+        """
         try:
-            import json
-            config_path = self.report_dir / ".report_config.json"
-            if config_path.exists():
-                with open(config_path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
+            mtime = os.stat(self._config_path_str).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._config_mtime and self._cached_pdf_path is not None:
+            return self._cached_config
+        
+        config = None
+        if mtime is not None:
+            try:
+                with open(self._config_path_str, "rb") as f:
+                    config = _loads(f.read())
+            except Exception:
+                pass
+        
+        self._config_mtime = mtime
+        self._cached_config = config
+        self._cached_pdf_path = self._build_pdf_path(config)
+        return config
+    
+    def _build_pdf_path(self, config: Optional[Dict[str, str]]) -> Path:
+        """Строит путь к PDF файлу по конфигу."""
+        try:
+            if config is not None:
                 author_name = config.get("author_name", "Иванов И.И.")
                 author_group = config.get("author_group", "ИУ6-42Б")
                 return self.project_root / f"Отчет_{author_name}_{author_group}.pdf"
         except Exception:
             pass
         return self.project_root / "Отчет.pdf"
+    
+    def _get_pdf_path(self) -> Path:
+        """Возвращает путь к PDF файлу на основе конфига."""
+        self._load_title_config()
+        return self._cached_pdf_path
+        
+    def start_typst_watch(self):
+        """Запускает `typst watch`, который сам пересобирает PDF при изменениях."""
+        self._log(f"Запуск typst watch -> {self.pdf_file.name}")
+        # Вывод typst не перехватываем: иначе непрочитанный pipe может его заблокировать
+        self._typst_proc = subprocess.Popen(
+            [str(self.typst_bin), "watch", str(self.main_file), str(self.pdf_file)]
+        )
+    
+    def stop_typst_watch(self):
+        """Останавливает процесс `typst watch`."""
+        proc, self._typst_proc = self._typst_proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    
+    def process_pending(self, timeout: float = 1.0, settle: float = 0.3):
+        """
+        Выполняет накопленную работу.
         
-    def _should_process(self) -> bool:
-        """Проверяет, прошло ли достаточно времени с последней компиляции."""
-        now = time.time()
-        if now - self.last_compile_time < self.cooldown:
-            return False
-        self.last_compile_time = now
-        return True
+        Ждёт событий не дольше timeout секунд, затем ещё settle секунд,
+        чтобы серия сохранений схлопнулась в одну перегенерацию.
+        """
+        if not self._dirty_regen.wait(timeout):
+            return
+        time.sleep(settle)
+        self._dirty_regen.clear()
+        self._regenerate()
     
     def _log(self, message: str, style: str = "cyan"):
         """Выводит сообщение с временной меткой."""
         timestamp = datetime.now().strftime("%H:%M:%S")
         console.print(f"[dim][{timestamp}][/dim] [{style}]{message}[/{style}]", highlight=False)
     
-    def _regenerate_and_compile(self):
-        """Перегенерирует main.typ и компилирует PDF."""
-        if not self._should_process():
-            return
-            
-        self._log("results.txt изменён -> перегенерация main.typ...")
+    def _regenerate(self):
+        """Перегенерирует main.typ; PDF по нему пересоберёт typst watch."""
+        self._log("Перегенерация main.typ...")
         
         try:
-            # Запускаем генерацию без интерактивных промптов
-            result = subprocess.run(
-                [sys.executable, "-c", 
-                 "from iu6hardwarememorylab import generate_report; generate_report()"],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True
+            # Генерируем в текущем процессе, без интерактивных промптов.
+            # Конфиг читаем сами: load_title_config ищет его относительно cwd
+            success = generate_report(
+                project_root=str(self.project_root),
+                title_config=dict(self._load_title_config() or {})
             )
-            if result.returncode == 0:
-                self._log("main.typ обновлён", "green")
-                # force=True, чтобы не проверять cooldown повторно
-                self._compile_pdf(force=True)
-            else:
-                self._log(f"Ошибка генерации: {result.stderr}", "red")
-        except Exception as e:
-            self._log(f"Ошибка: {e}", "red")
-    
-    def _compile_pdf(self, force: bool = False):
-        """Компилирует PDF."""
-        if not force and not self._should_process():
+        except Exception:
+            self._log(f"Ошибка генерации:\n{traceback.format_exc()}", "red")
             return
         
+        if success:
+            self._log("main.typ обновлён", "green")
+            # Новый main.typ подхватит typst watch; здесь только проверяем путь к PDF
+            self._ensure_typst_watch()
+        else:
+            self._log("Ошибка генерации main.typ", "red")
+    
+    def _ensure_typst_watch(self):
+        """
+        Проверяет, что `typst watch` запущен и собирает PDF в актуальный файл.
+        
+        Сам ничего не компилирует: пересборку по изменениям делает typst.
+        Процесс перезапускается, только если сменилось имя PDF (конфиг)
+        или он завершился.
+        """
         # Обновляем путь к PDF (на случай изменения конфига)
-        self.pdf_file = self._get_pdf_path()
-            
-        self._log("Компиляция PDF...")
+        pdf_file = self._get_pdf_path()
+        proc = self._typst_proc
+        if proc is not None and proc.poll() is None and pdf_file == self.pdf_file:
+            return
         
+        self.stop_typst_watch()
+        self.pdf_file = pdf_file
         try:
-            result = subprocess.run(
-                [str(self.typst_bin), "compile", str(self.main_file), str(self.pdf_file)],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                self._log(f"PDF обновлён: {self.pdf_file.name}", "green")
-            else:
-                self._log(f"Ошибка компиляции:\n{result.stderr}", "red")
+            self.start_typst_watch()
         except Exception as e:
             self._log(f"Ошибка: {e}", "red")
     
@@ -137,43 +210,23 @@ class ReportWatcher(FileSystemEventHandler):
         if event.is_directory:
             return
             
-        path = Path(event.src_path)
-        
-        # Игнорируем временные файлы
-        if path.suffix in ('.swp', '.tmp', '~') or path.name.startswith('.'):
-            return
+        src_path = event.src_path
         
-        # results.txt изменён → перегенерировать и скомпилировать
-        if path == self.results_file:
-            self._regenerate_and_compile()
+        # results.txt изменён → перегенерировать (PDF пересоберёт typst watch)
+        if src_path == self._results_path_str:
+            self._log("results.txt изменён")
+            self._dirty_regen.set()
             return
 
-        # .report_config.json изменён → перегенерировать и скомпилировать
-        if path.name == ".report_config.json":
-            self._log("Конфигурация изменена -> перегенерация main.typ...")
-            self._regenerate_and_compile()
+        # .report_config.json изменён → перегенерировать и обновить имя PDF
+        if src_path == self._config_path_str:
+            self._log("Конфигурация изменена")
+            self._dirty_regen.set()
             return
         
-        # Изображение изменено → скомпилировать
-        # Проверяем что файл находится в папке img (непосредственно или в подпапках)
-        try:
-            path.relative_to(self.img_dir)
-            if path.suffix.lower() in ('.png', '.jpg', '.jpeg', '.svg'):
-                self._log(f"Изображение изменено: {path.name}")
-                self._compile_pdf()
-                return
-        except ValueError:
-            pass  # Файл не в img директории
-        
-        # .typ файл изменён → скомпилировать
-        if path.suffix == '.typ':
-            try:
-                path.relative_to(self.report_dir)
-                self._log(f"Typst файл изменён: {path.name}")
-                self._compile_pdf()
-                return
-            except ValueError:
-                pass
+        # Изображения и .typ файлы отслеживает typst watch; PDF, временные
+        # файлы редакторов и прочее игнорируем, так что компиляция не может
+        # вызвать саму себя
     
     def on_created(self, event):
         """Обработка создания файла."""
@@ -202,29 +255,32 @@ def main():
     
     console.print(f"[cyan][[*]][/cyan] Папка: {report_dir}")
     console.print("[cyan][[*]][/cyan] Отслеживаемые файлы:")
-    console.print("   - results.txt -> перегенерация + компиляция")
-    console.print("   - .report_config.json -> перегенерация + компиляция")
-    console.print("   - img/*.png -> компиляция")
-    console.print("   - *.typ -> компиляция")
+    console.print("   - results.txt -> перегенерация")
+    console.print("   - .report_config.json -> перегенерация + имя PDF")
+    console.print("   - img/*.png, *.typ -> компиляция (typst watch)")
     console.print("[dim]Нажмите Ctrl+C для остановки[/dim]")
     
     # Создаём обработчик и наблюдатель
     handler = ReportWatcher(project_root, typst_bin)
     observer = Observer()
     
-    # Добавляем директорию для наблюдения (рекурсивно)
-    observer.schedule(handler, str(report_dir), recursive=True)
+    # Наблюдаем только саму папку отчёта: results.txt и конфиг лежат в ней,
+    # а подпапки (img/, typst/, кэши, вывод typst) отслеживает typst watch —
+    # их события до Python не доходят вовсе
+    observer.schedule(handler, str(report_dir), recursive=False)
     observer.start()
+    handler.start_typst_watch()
     
     try:
         while True:
-            time.sleep(1)
+            handler.process_pending()
     except KeyboardInterrupt:
         if Panel:
             console.print(Panel.fit("Наблюдение остановлено", border_style="yellow"))
         else:
             console.print("[yellow]Наблюдение остановлено[/yellow]")
         observer.stop()
+        handler.stop_typst_watch()
     
     observer.join()
 